@@ -0,0 +1,262 @@
+# benchmarks.conversion
+
+# Benchmarks every conversion in `conversion.yaml` (and the GIF pipeline)
+# against synthetic media generated locally with ffmpeg's test sources.
+#
+# Usage (from the repository root):
+#
+#   python benchmarks/conversion.py -o baseline.json
+#   python benchmarks/conversion.py -o new.json --compare baseline.json
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "src", "overseer"))
+
+from utils import configs as overseer_configs
+from utils.configs import load_config
+
+
+# Extensions that should be generated as a still image or as audio only.
+IMAGE_TYPES = {"bmp", "jpg", "jpeg", "png", "tiff", "webp"}
+AUDIO_TYPES = {"aac", "flac", "m4a", "mp3", "ogg", "opus", "wav"}
+
+RESOLUTIONS = ("320x240", "1280x720", "1920x1080")
+DURATIONS = (1, 5)
+
+
+def run(args: list[str]) -> dict[str, float | int]:
+    """
+    Run a subprocess to completion and collect its resource usage.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    stdout = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+
+    # Let `Popen` know the child was already reaped by `wait4`.
+    process.returncode = os.waitstatus_to_exitcode(status)
+    process.stdout.close()
+
+    return {
+        "returncode": process.returncode,
+        "stdout": stdout,
+        "wall_s": time.perf_counter() - start,
+        "cpu_s": usage.ru_utime + usage.ru_stime,
+        # `ru_maxrss` is in kilobytes on Linux.
+        "peak_rss_kb": usage.ru_maxrss
+    }
+
+
+def generate_fixture(
+    temp_dir: str,
+    filetype: str,
+    resolution: str,
+    duration: int
+) -> str | None:
+    """
+    Generate a synthetic input file with ffmpeg's lavfi test sources.
+    """
+    path = os.path.join(temp_dir, f"{resolution}_{duration}s.{filetype}")
+    if os.path.isfile(path):
+        return path
+
+    video = f"testsrc2=size={resolution}:rate=30:duration={duration}"
+    audio = f"sine=frequency=440:sample_rate=44100:duration={duration}"
+
+    if filetype in IMAGE_TYPES:
+        inputs = ["-f", "lavfi", "-i", video, "-frames:v", "1"]
+    elif filetype in AUDIO_TYPES:
+        inputs = ["-f", "lavfi", "-i", audio]
+    else:
+        inputs = ["-f", "lavfi", "-i", video, "-f", "lavfi", "-i", audio,
+                  "-shortest"]
+
+    result = run(["ffmpeg"] + inputs + ["-y", path])
+    return path if result["returncode"] == 0 else None
+
+
+def output_bytes(path: str, returncode: int) -> int | None:
+    """
+    Size of a run's output, or None if the run failed, then delete it so no
+    later run can report it as its own.
+    """
+    size = (os.path.getsize(path)
+            if returncode == 0 and os.path.isfile(path) else None)
+    if os.path.isfile(path):
+        os.remove(path)
+
+    return size
+
+
+def bench_conversion(
+    temp_dir: str,
+    input: str,
+    to_type: str,
+    options: list[list[str]]
+) -> dict[str, float | int]:
+    # Imported late so `--config-dir` applies to the cog's configs too.
+    from cogs.conversion import ffmpeg_args
+
+    output = os.path.join(temp_dir, f"{uuid.uuid4()}.{to_type}")
+    result = run(ffmpeg_args(input, output, options))
+    result["output_bytes"] = output_bytes(output, result["returncode"])
+
+    return result
+
+
+def bench_gif(temp_dir: str, input: str) -> dict[str, float | int]:
+    """
+    The GIF pipeline is three processes, so sum their times and take the
+    largest peak RSS among them.
+    """
+    palette = os.path.join(temp_dir, f"{uuid.uuid4()}.png")
+    output = os.path.join(temp_dir, f"{uuid.uuid4()}.gif")
+
+    # Imported late so `--config-dir` applies to the cog's configs too.
+    from cogs.conversion import (ffprobe_fps_args, gif_args,
+                                 gif_palette_args, parse_fps)
+
+    steps = [run(ffprobe_fps_args(input))]
+    try:
+        fps = parse_fps(steps[-1]["stdout"])
+    except (ValueError, ZeroDivisionError):
+        fps = None
+
+    if steps[-1]["returncode"] == 0 and fps:
+        steps.append(run(gif_palette_args(input, palette, fps)))
+        if steps[-1]["returncode"] == 0:
+            steps.append(run(gif_args(input, palette, output, fps)))
+
+    returncode = steps[-1]["returncode"] if len(steps) == 3 else 1
+    if os.path.isfile(palette):
+        os.remove(palette)
+
+    return {
+        "returncode": returncode,
+        "wall_s": sum(step["wall_s"] for step in steps),
+        "cpu_s": sum(step["cpu_s"] for step in steps),
+        "peak_rss_kb": max(step["peak_rss_kb"] for step in steps),
+        "output_bytes": output_bytes(output, returncode)
+    }
+
+
+def benchmark(
+    configs: dict,
+    resolutions: tuple[str],
+    durations: tuple[int],
+    repeat: int
+) -> dict[str, dict[str, float | int]]:
+    results = {}
+
+    with tempfile.TemporaryDirectory() as temp:
+        for (from_type, to_type), options in configs["valid_conversions"].items():
+            for resolution in resolutions:
+                # Audio and images don't have a duration worth varying.
+                for duration in (durations if from_type not in IMAGE_TYPES
+                                 else durations[:1]):
+                    input = generate_fixture(
+                        temp, from_type, resolution, duration)
+                    name = f"{from_type}->{to_type}@{resolution}/{duration}s"
+
+                    if input is None:
+                        print(f"{name}: could not generate fixture, skipped")
+                        continue
+
+                    # Keep the fastest run to reduce scheduling noise.
+                    runs = [bench_gif(temp, input) if to_type == "gif"
+                            else bench_conversion(temp, input, to_type, options)
+                            for _ in range(repeat)]
+                    best = min(runs, key=lambda r: r["wall_s"])
+                    best.pop("stdout", None)
+                    best["input_bytes"] = os.path.getsize(input)
+                    results[name] = best
+
+                    print(f"{name}: {best['wall_s']:.3f}s wall, "
+                          f"{best['cpu_s']:.3f}s cpu, "
+                          f"{best['peak_rss_kb']} KiB peak, "
+                          + (f"{best['output_bytes']} B out"
+                             if best["output_bytes"] is not None
+                             else "failed"))
+
+    return results
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """
+    Print the relative change of every metric against a previous run.
+    """
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name}: new")
+            continue
+
+        deltas = []
+        for metric in ("wall_s", "cpu_s", "peak_rss_kb", "output_bytes"):
+            old, new = baseline[name][metric], result[metric]
+            # Failed runs have no output to compare.
+            if old is None or new is None:
+                deltas.append(f"{metric} n/a")
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            deltas.append(f"{metric} {change:+.1f}%")
+
+        print(f"{name}: {', '.join(deltas)}")
+
+    for name in baseline.keys() - results.keys():
+        print(f"{name}: removed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the configured ffmpeg conversions.")
+    parser.add_argument("-o", "--output", default="bench_conversion.json",
+                        help="Where to write the JSON results.")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="A previous JSON result to diff against.")
+    parser.add_argument("--config-dir", default=None,
+                        help="Directory containing colors.yaml and "
+                             "conversion.yaml.")
+    parser.add_argument("--resolutions", nargs="+", default=RESOLUTIONS)
+    parser.add_argument("--durations", nargs="+", type=int,
+                        default=DURATIONS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # The conversion cog loads its configs when it's first imported, so this
+    # has to be set before then.
+    if args.config_dir:
+        overseer_configs.CONFIG_DIR = args.config_dir
+
+    configs = load_config(
+        "conversion", safe=False, config_dir=args.config_dir)
+    version = subprocess.run(["ffmpeg", "-version"], capture_output=True,
+                             text=True).stdout.partition("\n")[0]
+
+    results = benchmark(
+        configs, tuple(args.resolutions), tuple(args.durations), args.repeat)
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "ffmpeg": version,
+            "platform": platform.platform(),
+            "results": results
+        }, file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file)["results"])
+
+
+if __name__ == "__main__":
+    main()
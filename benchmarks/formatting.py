@@ -0,0 +1,292 @@
+# benchmarks.formatting
+
+# Micro-benchmarks for every Formatting command and for mention parsing,
+# run against fake Discord objects so no network connection is needed.
+#
+# Usage (from the repository root):
+#
+#   python benchmarks/formatting.py --save baseline.json
+#   python benchmarks/formatting.py --baseline baseline.json
+#   python benchmarks/formatting.py --config-dir path/to/configs
+#
+# The script exits non-zero if a case scales worse than linearly with its
+# input size or, with `--baseline`, if a case got slower or allocates more
+# than the tolerance allows.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "src", "overseer"))
+
+from utils import configs as overseer_configs
+from utils import transforms
+from utils.parsers import mention_cache, parse_mentions
+
+
+SIZES = (10, 100, 1000, 10000)
+
+# Largest tolerated growth of time per call for a 10x larger input, as an
+# exponent: 1.0 is linear, 2.0 is quadratic.
+MAX_SCALING = 1.4
+
+
+class FakeNamed:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeGuild:
+    id = 1
+
+    def get_role(self, id: int) -> FakeNamed | None:
+        return FakeNamed(f"role{id}") if id % 2 else None
+
+
+class FakeBot:
+    def get_user(self, id: int) -> FakeNamed | None:
+        return FakeNamed(f"user{id}") if id % 2 else None
+
+    def get_channel(self, id: int) -> FakeNamed | None:
+        return FakeNamed(f"channel{id}") if id % 2 else None
+
+
+class FakeMessage:
+    attachments = []
+
+
+class FakeContext:
+    def __init__(self, invoked_with: str):
+        self.guild = FakeGuild()
+        self.invoked_with = invoked_with
+        self.message = FakeMessage()
+
+    async def send(self, *args, **kwargs) -> None:
+        pass
+
+
+def make_inputs(size: int, rng: random.Random) -> dict[str, str]:
+    """
+    Plain ASCII words, mention-dense text, and Unicode-heavy text, each
+    exactly `size` characters long.
+    """
+    def fill(pieces: list[str]) -> str:
+        text, length = [], 0
+        while length < size:
+            piece = rng.choice(pieces)
+            text.append(piece)
+            length += len(piece) + 1
+
+        return " ".join(text)[:size]
+
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur",
+             "adipiscing", "elit", "sed", "do", "eiusmod", "tempor"]
+    mentions = [f"<@{rng.randrange(10**17, 10**18)}>" for _ in range(20)]
+    mentions += [f"<#{rng.randrange(10**17, 10**18)}>" for _ in range(10)]
+    mentions += [f"<@&{rng.randrange(10**17, 10**18)}>" for _ in range(10)]
+    unicode = ["héllo", "wörld", "naïve", "straße", "日本語", "😀🎉",
+               "Ωμέγα", "привет", "ﬁne", "İstanbul"]
+
+    return {
+        "ascii": fill(words),
+        "mentions": fill(mentions + words[:4]),
+        "unicode": fill(unicode)
+    }
+
+
+def cases(cog: "Formatting") -> dict[str, tuple]:
+    """
+    Each case is a command callback, the alias it's invoked with, the
+    positional arguments before the message, and optionally the name of the
+    message parameter.
+    """
+    pipeline = transforms.compile_pipeline("mock|clap|reverse")
+
+    return {
+        "bify": (cog.bify, "bify", ("text", "z")),
+        "cipher": (cog.cipher, "cipher", ("text", 3)),
+        "cksum": (cog.cksum, "sha256", ("text",)),
+        "clap": (cog.clap, "clap", ("text",)),
+        "expand": (cog.expand, "expand", ("text",)),
+        "fmt": (cog.fmt, "fmt", ("text", pipeline)),
+        "leetspeak": (cog.leetspeak, "leetspeak", ("text",)),
+        "mock": (cog.mock, "mock", ("text",)),
+        "reverse": (cog._reverse, "reverse", ("text",)),
+        "say": (cog.say, "say", ("text",), "msg"),
+    }
+
+
+async def time_call(call, min_time: float = 0.05, repeat: int = 5) -> float:
+    """
+    Best-of-`repeat` seconds per call, calibrating the number of calls so
+    each measurement runs for at least `min_time`.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            await call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            await call()
+        timings.append((time.perf_counter() - start) / number)
+
+    return min(timings)
+
+
+async def peak_allocation(call) -> int:
+    """
+    Peak bytes allocated by a single call.
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        await call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak - baseline
+
+
+async def benchmark(sizes: tuple[int], seed: int) -> dict[str, dict]:
+    # Imported late so `--config-dir` applies to the cog's configs too.
+    from cogs.formatting import Formatting
+
+    rng = random.Random(seed)
+    bot = FakeBot()
+    cog = Formatting(bot)
+    inputs = {size: make_inputs(size, rng) for size in sizes}
+    results = {}
+
+    def command_call(callback, alias, args, keyword="message", *, message):
+        context = FakeContext(alias)
+        return lambda: callback.callback(
+            cog, context, *args, **{keyword: message})
+
+    def mentions_call(message, cached):
+        async def call():
+            if not cached:
+                mention_cache.clear()
+            parse_mentions(message, bot, FakeGuild())
+        return call
+
+    for size in sizes:
+        for kind, message in inputs[size].items():
+            calls = {
+                f"{name}/{kind}/{size}": command_call(*case, message=message)
+                for name, case in cases(cog).items()
+            }
+            calls[f"parse_mentions/{kind}/{size}"] = mentions_call(
+                message, cached=True)
+            calls[f"parse_mentions_cold/{kind}/{size}"] = mentions_call(
+                message, cached=False)
+
+            for name, call in calls.items():
+                results[name] = {
+                    "seconds": await time_call(call),
+                    "peak_bytes": await peak_allocation(call)
+                }
+                print(f"{name}: {results[name]['seconds'] * 1e6:.1f} us, "
+                      f"{results[name]['peak_bytes']} B peak")
+
+    return results
+
+
+def check_scaling(results: dict, sizes: tuple[int]) -> list[str]:
+    """
+    Flag cases whose time per call grows faster than `MAX_SCALING` between
+    the two largest sizes.
+    """
+    if len(sizes) < 2:
+        return []
+
+    small, large = sorted(sizes)[-2:]
+    failures = []
+    for name, result in results.items():
+        case, kind, size = name.rsplit("/", 2)
+        if int(size) != large:
+            continue
+
+        before = results[f"{case}/{kind}/{small}"]["seconds"]
+        exponent = (math.log(result["seconds"] / before)
+                    / math.log(large / small))
+        if exponent > MAX_SCALING:
+            failures.append(
+                f"{case}/{kind}: scales as n^{exponent:.2f} "
+                f"from {small} to {large} characters")
+
+    return failures
+
+
+def check_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    failures = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        for metric in ("seconds", "peak_bytes"):
+            old, new = baseline[name][metric], result[metric]
+            if old and new > old * (1 + tolerance):
+                failures.append(
+                    f"{name}: {metric} regressed {(new - old) / old:+.0%}")
+
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the text formatting commands.")
+    parser.add_argument("--save", metavar="PATH",
+                        help="Write the results to a JSON baseline.")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="Fail if results regress past this baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed slowdown, e.g. 0.5 for 50%%.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config-dir", default=None,
+                        help="Directory containing colors.yaml.")
+    args = parser.parse_args()
+
+    # The formatting cog loads its configs when it's first imported, so this
+    # has to be set before then.
+    if args.config_dir:
+        overseer_configs.CONFIG_DIR = args.config_dir
+
+    sizes = tuple(args.sizes)
+    results = asyncio.run(benchmark(sizes, args.seed))
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    failures = check_scaling(results, sizes)
+    if args.baseline:
+        with open(args.baseline) as file:
+            failures += check_baseline(results, json.load(file), args.tolerance)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
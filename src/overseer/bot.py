@@ -9,9 +9,14 @@ import os
 import platform
 
 from cogs import load_cogs
-from utils import custom_exceptions
+from utils import custom_exceptions, parsers
 from utils.configs import load_bot_configs, load_config
+from utils.cooldowns import CooldownStore
+from utils.downloads import DownloadManager
 from utils.error_handlers import handle_error
+from utils.http import create_session
+from utils.interactions import ReactionRegistry
+from utils.outbound import OutboundContext, SendScheduler
 
 import discord
 from discord.ext.commands import Bot
@@ -28,14 +33,26 @@ activity = discord.Activity(name="You", type=discord.ActivityType.watching)
 # discord.Intents(**config["intents"]).
 intents = discord.Intents.all()
 
+# Everything the Overseer sends is queued here, paced by the rate limit
+# headers it sees on discord.py's requests.
+outbound = SendScheduler(**load_config("outbound", required=False))
+
+
+class Overseer(Bot):
+    async def get_context(self, origin, *, cls=OutboundContext):
+        # Command replies go through the outbound queue too.
+        return await super().get_context(origin, cls=cls)
+
+
 # Initialize bot instance.
-bot = Bot(
+bot = Overseer(
     owner_ids=set(config["owners"]),      # Owners of the Overseer.
     command_prefix=config["bot_prefix"],  # Set command prefix.
     intents=intents,                      # Set intents.
     activity=activity,                    # Set the Overseer's status.
     help_command=None,                    # Remove default help command.
-    strip_after_prefix=True               # !   <command> becomes !<command>.
+    strip_after_prefix=True,              # !   <command> becomes !<command>.
+    http_trace=outbound.trace_config      # Rate limit headers for pacing.
 )
 
 
@@ -85,6 +102,49 @@ async def on_message(message):
     await bot.process_commands(message)
 
 
+# Route reactions to whatever is waiting on that message, e.g. games.
+@bot.event
+async def on_raw_reaction_add(payload):
+    bot.interactions.dispatch("reaction_add", payload)
+
+
+@bot.event
+async def on_raw_reaction_remove(payload):
+    bot.interactions.dispatch("reaction_remove", payload)
+
+
+# Keep cached mention names in sync with renames and deletions.
+@bot.event
+async def on_user_update(before, after):
+    if before.name != after.name:
+        parsers.invalidate_user(after.id)
+
+
+@bot.event
+async def on_guild_role_update(before, after):
+    parsers.invalidate_role(after.guild.id, after.id)
+
+
+@bot.event
+async def on_guild_role_delete(role):
+    parsers.invalidate_role(role.guild.id, role.id)
+
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    parsers.invalidate_channel(after.id)
+
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    parsers.invalidate_channel(channel.id)
+
+
+@bot.event
+async def on_guild_remove(guild):
+    parsers.invalidate_guild(guild.id)
+
+
 # Executes every time a command has been *successfully* executed.
 @bot.event
 async def on_command_completion(context):
@@ -122,9 +182,28 @@ async def on_command_error(context, error):
 # ---------------------------- STARTUP EXECUTION ---------------------------- #
 
 async def main():
+    # Shared services that cogs access through the bot instance. The HTTP
+    # client is `bot.session` because discord.py already uses `bot.http`.
+    bot.session = create_session(**load_config("http", required=False))
+    bot.downloads = DownloadManager(
+        bot.session, **load_config("downloads", required=False))
+    bot.cooldowns = CooldownStore(**load_config("cooldowns", required=False))
+    bot.cooldowns.start()
+    bot.interactions = ReactionRegistry()
+    bot.interactions.start()
+    bot.outbound = outbound
+    bot.config = config
+
     await load_cogs(bot)
-    async with bot:
-        await bot.start(config["token"])
+    try:
+        async with bot:
+            await bot.start(config["token"])
+    finally:
+        await bot.outbound.close()
+        await bot.interactions.close()
+        await bot.cooldowns.close()
+        await bot.downloads.close()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
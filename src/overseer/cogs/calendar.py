@@ -1,145 +1,346 @@
 # overseer.cogs.calendar
 
+import asyncio
 import datetime
-import icalendar
+from dateutil import parser
 import logging
 import os
 import re
 
+from utils.calendars import (
+    CalendarIndex,
+    Event,
+    NotificationLedger,
+    NotificationScheduler
+)
 from utils.configs import load_config
+from utils.outbound import INTERACTIVE
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 # Color and logger configs.
 colors = load_config("colors")
 logger = logging.getLogger()
 
+# Limits for the events command.
+DEFAULT_EVENTS = 5
+MAX_EVENTS = 100
+PAGE_SIZE = 10
+PAGE_TIMEOUT = 120
+PAGE_REACTIONS = {"◀️": -1, "▶️": 1}
+
+# Separates the two times given to `events between`.
+RANGE_PATTERN = re.compile(r"\s+(?:and|to|-)\s+", re.IGNORECASE)
+
 
-# TODO: Add support for recurring events.
 class Calendar(commands.Cog, name="calendar"):
     def __init__(self, bot):
         self.bot = bot
-        self.cal_dir = "lists"
-        self.cal_file = "calendar.ics"
-        self.timeout = 5.0
+        self.cal_dir = "lists/calendars"
+        # The calendar used before servers had their own.
+        self.global_cal = "lists/calendar.ics"
+
+        self.configs = dict(load_config("calendar", required=False))
+        self.ledger = NotificationLedger(
+            self.configs.pop("ledger_path", "lists/notifications.json"))
+
+        # Each server's calendar and scheduler, by guild ID (None for the
+        # global calendar), so one server's calendar never slows another's.
+        # Only servers with a calendar file have either.
+        self.calendars: dict[int | None, CalendarIndex] = {}
+        self.schedulers: dict[int | None, NotificationScheduler] = {}
+        self.watch_interval = self.configs.get("watch_interval", 30.0)
+        self.watcher = None
+
+        # Where events without a `CHANNELS:` line are sent.
+        self.general_channel_id = bot.config.get("general_channel_id")
+
+    async def cog_load(self):
+        self.ledger.load()
+
+    async def cog_unload(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+        await asyncio.gather(*(scheduler.close()
+                               for scheduler in self.schedulers.values()))
+        await self.ledger.close()
 
     @commands.Cog.listener()
     async def on_ready(self):
-        self.check_calendar.start()
-
-    # Continuous loop to check for upcoming events.
-    @tasks.loop(minutes=5.0)
-    async def check_calendar(self):
-        with open(os.path.join(self.cal_dir, self.cal_file), 'r') as calendar:
-            # Loed iterator for all events.
-            calendar = calendar.read()
-            events = icalendar.Calendar.from_ical(calendar).walk('vevent')
-
-            # Filter for properly formatted dates.
-            events = filter(lambda e: isinstance(
-                e["DTSTART"].dt, datetime.datetime), events)
-
-            # Initialize embed object to list events in.
-            """embed = discord.Embed(
-                title="Upcoming Events",
-                description="Here are the upcoming events that I've planned.",
+        # `on_ready` fires again after reconnects.
+        if self.watcher is None or self.watcher.done():
+            self.watcher = asyncio.ensure_future(self.watch_calendars())
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        await self.remove_calendar(guild.id)
+
+    async def watch_calendars(self) -> None:
+        """
+        Start a scheduler for each calendar file that appears and stop the
+        ones whose file is gone. One directory listing per check covers
+        every server, however many the Overseer is in.
+        """
+        while True:
+            try:
+                found = await asyncio.to_thread(self.find_calendars)
+            except OSError as e:
+                found = None
+                logger.error(
+                    "Failed to list calendars in %s (%s): %s",
+                    self.cal_dir,
+                    type(e).__name__,
+                    str(e)
+                )
+
+            if found is not None:
+                # Files for servers the Overseer has left are ignored.
+                found = {guild_id: path for guild_id, path in found.items()
+                         if guild_id is None or self.bot.get_guild(guild_id)}
+                for guild_id in self.schedulers.keys() - found.keys():
+                    await self.remove_calendar(guild_id)
+                for guild_id, path in found.items():
+                    self.add_calendar(guild_id, path)
+
+            await asyncio.sleep(self.watch_interval)
+
+    def find_calendars(self) -> dict[int | None, str]:
+        found = {}
+        if os.path.isfile(self.global_cal):
+            found[None] = self.global_cal
+
+        if not os.path.isdir(self.cal_dir):
+            return found
+
+        with os.scandir(self.cal_dir) as entries:
+            for entry in entries:
+                guild_id, extension = os.path.splitext(entry.name)
+                if (extension == ".ics" and guild_id.isdigit()
+                        and entry.is_file()):
+                    found[int(guild_id)] = entry.path
+
+        return found
+
+    def add_calendar(self, guild_id: int | None, path: str) -> None:
+        if guild_id in self.schedulers:
+            return
+
+        # The general channel belongs to one server, so a server's own
+        # calendar falls back on that server's system channel instead.
+        if guild_id is None:
+            default_channel = self.general_channel_id
+        else:
+            guild = self.bot.get_guild(guild_id)
+            channel = guild.system_channel if guild is not None else None
+            default_channel = channel.id if channel is not None else None
+
+        # Fires each notification at its lead time before the event.
+        self.calendars[guild_id] = calendar = CalendarIndex(path)
+        self.schedulers[guild_id] = scheduler = NotificationScheduler(
+            calendar, self.notify, self.ledger, default_channel=default_channel,
+            **self.configs)
+        scheduler.start()
+
+    async def remove_calendar(self, guild_id: int | None) -> None:
+        self.calendars.pop(guild_id, None)
+        if (scheduler := self.schedulers.pop(guild_id, None)) is not None:
+            await scheduler.close()
+
+    async def notify(
+        self,
+        event: Event,
+        target: str,
+        now: datetime.datetime
+    ) -> None:
+        delta = round((event.start - now).total_seconds() / 60)
+        description = f"{event.summary} from {event.start.strftime('%I:%M %p')} " \
+                      f"to {event.end.strftime('%I:%M %p')} "
+        if delta > 0:
+            description += f"is starting in {delta} " \
+                           f"{'minute!' if delta == 1 else 'minutes!'}"
+        elif delta < 0:
+            # Caught up on after the bot was down.
+            description += f"started {-delta} " \
+                           f"{'minute ago!' if delta == -1 else 'minutes ago!'}"
+        else:
+            description += f"is starting now!"
+
+        kind, _, target_id = target.partition(":")
+        if kind == "channel":
+            # If channel isn't found, don't try and send a message.
+            if not (channel := self.bot.get_channel(int(target_id))):
+                return
+
+            # Assemble string of stuff to watch.
+            episodes_list = "\n".join(
+                [f" - {e['show']} - Episode {e['episode']}"
+                 for e in event.episodes]
+            )
+            movies_list = ('\n' if episodes_list else ''
+                           + "\n".join([f" - {m}" for m in event.movies]))
+            content_list = episodes_list + movies_list
+
+            # Create embed object to send.
+            embed = discord.Embed(
+                title="Upcoming Event",
+                description=description,
                 color=colors["green"]
-            )"""
-
-            for event in events:
-                # Get basic info about event.
-                summary = event.get("summary")
-                start = event.get("dtstart").dt
-                end = event.get("dtend").dt
-                description = event.get("description", "")
-
-                # Timestamps to compare against.
-                now = datetime.datetime.now(datetime.timezone.utc)
-                later = now + datetime.timedelta(minutes=self.timeout)
-
-                # Get appropriate channels to send the notification to.
-                try:
-                    channels = re.findall(
-                        r'(?<=CHANNELS: )\d+[^\\\n]*', description)[0].split(',')
-                    channels = list(map(lambda c: int(c.strip()), channels))
-                except IndexError:
-                    # TODO: Fix to work with new config layout.
-                    channels = [config["general_channel_id"]]
-
-                # Get episodes to watch.
-                episodes = re.findall(
-                    r'(?<=EPISODE: )[^\\\n]*', description)
-                if episodes:
-                    episodes = list(map(lambda e: e.split("::"), episodes))
-                    episodes = list(map(
-                        lambda e: {"show": e[0], "episode": e[1]}, episodes))
-
-                # Get movies to watch.
-                movies = re.findall(r'(?<=MOVIE: )[^\\\n]*', description)
-
-                # Event isn't happening any time soon, so don't notify people.
-                if not now <= start <= later:
-                    continue
-
-                delta = int((start - now).total_seconds() // 60)
-                description = f"{summary} from {start.strftime('%I:%M %p')} " \
-                              f"to {end.strftime('%I:%M %p')} "
-                if delta:
-                    description += f"is starting in {delta} " \
-                                   f"{'minute!' if delta == 1 else 'minutes!'}"
-                else:
-                    description += f"is starting now!"
-
-                for channel in channels:
-                    # If channel isn't found, don't try and send a message.
-                    if not (channel := self.bot.get_channel(channel)):
-                        continue
-
-                    # Assemble string of stuff to watch.
-                    episodes_list = "\n".join(
-                        [f" - {e['show']} - Episode {e['episode']}"
-                         for e in episodes]
-                    )
-                    movies_list = ('\n' if episodes_list else ''
-                                   + "\n".join([f" - {m}" for m in movies]))
-                    content_list = episodes_list + movies_list
-
-                    # Create embed object to send.
-                    embed = discord.Embed(
-                        title="Upcoming Event",
-                        description=description,
-                        color=colors["green"]
-                    )
-                    embed.add_field(
-                        name="Today's Watch List",
-                        value=content_list,
-                        inline=False
-                    )
-
-                    # Send message.
-                    await channel.send(embed=embed)
-
-                attendees = event.get('attendee')
-                if isinstance(attendees, str):
-                    attendees = [attendees]
-                for attendee in attendees:
-                    # If user isn't found, don't try and send a message.
-                    if not (attendee := self.bot.get_user(int(attendee))):
-                        continue
-
-                    await attendee.send(description)
-
-    @commands.command(
+            )
+            embed.add_field(
+                name="Today's Watch List",
+                value=content_list,
+                inline=False
+            )
+
+            # Send message. Notifications for the same channel can
+            # share a message.
+            await self.bot.outbound.send(channel, embed=embed, batch=True)
+        else:
+            # If user isn't found, don't try and send a message.
+            if not (attendee := self.bot.get_user(int(target_id))):
+                return
+
+            await self.bot.outbound.send(attendee, description)
+
+    @commands.group(
         name="events",
-        usage="events",
-        brief="Lists calendar events."
+        usage="events <count>",
+        brief="Lists upcoming calendar events.",
+        invoke_without_command=True
     )
-    async def events(self, context):
+    async def events(self, context, count: int = DEFAULT_EVENTS):
+        """
+        List the next events on this server's calendar.
+
+        Parameters
+        -----------
+        count: int
+            How many events to list, up to 100. Defaults to 5.
         """
-        List all events on this server's calendar.
+        count = max(1, min(count, MAX_EVENTS))
+        now = datetime.datetime.now(datetime.timezone.utc)
+        calendar = self.server_calendar(context)
+        events = calendar.after(now, count) if calendar else []
+
+        await self.send_pages(context, "Upcoming Events", events)
+
+    @events.command(
+        name="between",
+        usage="between <start> and <end>",
+        brief="Lists calendar events in a time range."
+    )
+    async def events_between(self, context, *, times: str):
         """
-        pass
+        List the events on this server's calendar that start in a time
+        range, e.g. `events between oct 20 and oct 27 6pm`. Times without
+        a date are today, and times without a time of day are midnight.
+
+        Parameters
+        -----------
+        times: str
+            The start and end of the range, separated by "and" or "to".
+        """
+        times = RANGE_PATTERN.split(times.strip(), maxsplit=1)
+        if len(times) != 2:
+            times = times[0].split(maxsplit=1)
+        if len(times) != 2:
+            raise commands.BadArgument(
+                'Give a start and an end, like "oct 20 and oct 27"')
+
+        start, end = map(parse_time, times)
+        if end <= start:
+            raise commands.BadArgument("The end must be after the start")
+
+        calendar = self.server_calendar(context)
+        events = (calendar.between(start, end, limit=MAX_EVENTS) if calendar
+                  else [])
+        title = (f"Events From {start.strftime('%b %d %I:%M %p')} "
+                 f"to {end.strftime('%b %d %I:%M %p')}")
+
+        await self.send_pages(context, title, events)
+
+    def server_calendar(self, context) -> CalendarIndex | None:
+        calendar = self.calendars.get(getattr(context.guild, "id", None))
+
+        # Servers without events of their own share the global calendar.
+        if not calendar:
+            calendar = self.calendars.get(None)
+
+        return calendar
+
+    async def send_pages(self, context, title: str, events: list[Event]):
+        if not events:
+            await context.send(embed=discord.Embed(
+                title="No Events Found!",
+                description="There's nothing on the calendar for then.",
+                color=colors["red"]
+            ))
+            return
+
+        pages = [events[i:i + PAGE_SIZE]
+                 for i in range(0, len(events), PAGE_SIZE)]
+        embeds = []
+        for number, page in enumerate(pages, 1):
+            embed = discord.Embed(title=title, color=colors["green"])
+            for event in page:
+                embed.add_field(
+                    name=event.summary or "Untitled Event",
+                    value=f"{event.start.strftime('%a %b %d, %I:%M %p')} "
+                          f"to {event.end.strftime('%I:%M %p')}",
+                    inline=False
+                )
+            embed.set_footer(text=f"Page {number} of {len(pages)}")
+            embeds.append(embed)
+
+        message = await context.send(embed=embeds[0])
+        if len(embeds) == 1:
+            return
+
+        await asyncio.gather(*(
+            self.bot.outbound.add_reaction(message, emoji)
+            for emoji in PAGE_REACTIONS))
+
+        page = 0
+        while True:
+            try:
+                # Only the person who asked can turn the pages.
+                payload = await self.bot.interactions.wait(
+                    message.id,
+                    timeout=PAGE_TIMEOUT,
+                    check=lambda payload: (payload.user_id == context.author.id
+                                           and str(payload.emoji)
+                                           in PAGE_REACTIONS)
+                )
+            except asyncio.TimeoutError:
+                break
+
+            page = (page + PAGE_REACTIONS[str(payload.emoji)]) % len(embeds)
+            await self.bot.outbound.edit(
+                message, embed=embeds[page], priority=INTERACTIVE)
+
+            # Needs Manage Messages, so it's fine if it doesn't work.
+            try:
+                await self.bot.outbound.remove_reaction(
+                    message, payload.emoji, discord.Object(payload.user_id))
+            except discord.HTTPException:
+                pass
+
+        try:
+            await self.bot.outbound.clear_reactions(message)
+        except discord.HTTPException:
+            pass
+
+
+def parse_time(text: str) -> datetime.datetime:
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    try:
+        time = parser.parse(text, default=today)
+    except (ValueError, OverflowError):
+        raise commands.BadArgument(f"`{text}` isn't a time I understand")
+
+    # Times without a time zone are in the bot's local time zone.
+    return time if time.tzinfo else time.astimezone()
 
 
 async def setup(bot: commands.Bot):
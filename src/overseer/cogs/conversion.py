@@ -1,6 +1,8 @@
 # overseer.cogs.conversion
 
+import asyncio
 import asynctempfile
+import contextlib
 import logging
 import os
 import subprocess
@@ -15,6 +17,98 @@ from discord.ext import commands
 colors = load_config("colors")
 logger = logging.getLogger()
 
+# Discord rejects messages with more than 10 attachments, and DMs and
+# unboosted servers cap the total upload size at 8 MiB.
+MAX_FILES_PER_MESSAGE = 10
+DEFAULT_FILESIZE_LIMIT = 8 * 1024 * 1024
+
+
+async def run_subprocess(args: list[str], capture: bool = False) -> tuple[int, bytes]:
+    """
+    Run a subprocess without blocking the event loop. Returns the exit code
+    and, if `capture` is set, everything the process wrote to stdout.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    stdout, _ = await process.communicate()
+
+    return process.returncode, stdout or b""
+
+
+def remove_files(*paths: str) -> None:
+    """
+    Delete intermediate files as soon as they're no longer needed, so a batch
+    of conversions never holds more than one file's inputs on disk.
+    """
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def ffmpeg_args(input: str, output: str, options: list[list[str]]) -> list[str]:
+    """
+    Common options passed into ffmpeg:
+
+      -i <input_path>: Path to file being converted.
+      -<codec:v>|<c:v> copy: Copy or add playback metadata to the file.
+      -<codec:a>|<c:a> copy: Copy or add audio metadata to the file.
+      -frames:v <n>: Take only the first `n` frames of a video.
+      -vf format=<format>: Pixel format for the image / video.
+      -y <output_path>: Path for output file (overwrite existing file).
+
+    """
+    return (["ffmpeg"]
+            + options[0]
+            + ["-i", input]
+            + options[1]
+            + ["-y", output])
+
+
+def ffprobe_fps_args(input: str) -> list[str]:
+    """
+    Extract the average frame rate of a video as a fraction.
+    """
+    return [
+        "ffprobe", input,
+        "-v", "quiet",                            # Suppress all output.
+        "-of", "csv=p=0",                         # Remove extra text.
+        "-select_streams", "v",                   # Video input.
+        "-show_entries", "stream=avg_frame_rate"  # Avg fps as fraction.
+    ]
+
+
+def parse_fps(ffprobe_output: bytes) -> float:
+    top, bottom = ffprobe_output.decode("utf-8").strip().split("/")
+    return round(int(top) / int(bottom), 2)
+
+
+def gif_palette_args(input: str, palette: str, fps: float) -> list[str]:
+    """
+    Generate a pallete for the GIF with the following arguments:
+
+      -vf fps=<fps>: Match the FPS of the input video.
+          scale=512:-1: Adjust height based on a width of 512px.
+          flags=lanczos,palettegen: Scaling and palette algorithms.
+
+    """
+    return [
+        "ffmpeg", "-i", input,
+        "-vf", f"fps={fps},scale=512:-1:flags=lanczos,palettegen",
+        "-y", palette
+    ]
+
+
+def gif_args(input: str, palette: str, output: str, fps: float) -> list[str]:
+    return [
+        "ffmpeg", "-i", input, "-i", palette,
+        "-lavfi", (f"fps={fps},scale=512:-1:flags=lanczos "
+                   + "[x]; [x][1:v] paletteuse"),
+        "-y", output
+    ]
+
 
 class Conversion(commands.Cog, name="conversion"):
     """
@@ -49,30 +143,15 @@ class Conversion(commands.Cog, name="conversion"):
         input = os.path.join(temp_dir, f"{uuid.uuid4()}.{from_type}")
         output = os.path.join(temp_dir, f"{uuid.uuid4()}.{to_type}")
 
-        # Download file from Discord.
-        await attachment.save(fp=input)
-
-        """
-        Common options passed into ffmpeg:
-
-          -i <input_path>: Path to file being converted.
-          -<codec:v>|<c:v> copy: Copy or add playback metadata to the file.
-          -<codec:a>|<c:a> copy: Copy or add audio metadata to the file.
-          -frames:v <n>: Take only the first `n` frames of a video.
-          -vf format=<format>: Pixel format for the image / video.
-          -y <output_path>: Path for output file (overwrite existing file).
+        try:
+            # Download file from Discord.
+            async with self.bot.downloads.download(attachment) as download:
+                await download.save(input)
 
-        """
-        args = (["ffmpeg"]
-                + options[0]
-                + ["-i", input]
-                + options[1]
-                + ["-y", output])
-        result = subprocess.call(
-            args,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
+            args = ffmpeg_args(input, output, options)
+            result, _ = await run_subprocess(args)
+        finally:
+            remove_files(input)
 
         return output, result
 
@@ -92,55 +171,75 @@ class Conversion(commands.Cog, name="conversion"):
         palette = os.path.join(temp_dir, f"{uuid.uuid4()}.png")
         output = os.path.join(temp_dir, f"{uuid.uuid4()}.{to_type}")
 
-        # Download file from Discord.
-        await attachment.save(fp=input)
+        try:
+            # Download file from Discord.
+            async with self.bot.downloads.download(attachment) as download:
+                await download.save(input)
+
+            # Extract the frame rate of the input video.
+            probe_result, ffmpeg_output = await run_subprocess(
+                ffprobe_fps_args(input), capture=True)
+
+            # Stop conversion if the input couldn't be probed.
+            if probe_result:
+                return None, probe_result
+
+            # ffprobe can report nonsense like `0/0` for odd streams.
+            try:
+                fps = parse_fps(ffmpeg_output)
+            except (ValueError, ZeroDivisionError) as e:
+                logger.error(
+                    "Failed to read the frame rate of %s (%s): %s",
+                    attachment.filename,
+                    type(e).__name__,
+                    str(e)
+                )
+                return None, None
+
+            # Generate a palette for the GIF.
+            palette_result, _ = await run_subprocess(
+                gif_palette_args(input, palette, fps))
+
+            # Stop conversion if an error occurs.
+            if palette_result:
+                return None, palette_result
+
+            # Generate GIF from palette.
+            result, _ = await run_subprocess(
+                gif_args(input, palette, output, fps))
+        finally:
+            remove_files(input, palette)
 
-        # Extract the frame rate of the input video.
-        ffmpeg_output = subprocess.check_output([
-            "ffprobe", input,
-            "-v", "quiet",                            # Suppress all output.
-            "-of", "csv=p=0",                         # Remove extra text.
-            "-select_streams", "v",                   # Video input.
-            "-show_entries", "stream=avg_frame_rate"  # Avg fps as fraction.
-        ])
-        top, bottom = ffmpeg_output.decode("utf-8").strip().split("/")
-        fps = round(int(top) / int(bottom), 2)
+        return output, result
 
+    async def convert_attachment(
+        self,
+        temp_dir: str,
+        from_type: str,
+        to_type: str,
+        attachment: discord.Attachment
+    ) -> tuple[str, int]:
         """
-        Generate a pallete for the GIF with the following arguments:
-
-          -vf fps=<fps>: Match the FPS of the input video.
-              scale=512:-1: Adjust height based on a width of 512px.
-              flags=lanczos,palettegen: Scaling and palette algorithms.
-
+        Convert an attachment using the GIF pipeline or the configured
+        ffmpeg arguments, whichever applies.
         """
-        palette_result = subprocess.call(
-            [
-                "ffmpeg", "-i", input,
-                "-vf", f"fps={fps},scale=512:-1:flags=lanczos,palettegen",
-                "-y", palette
-            ],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
+        if to_type == "gif":
+            return await self.convert_to_gif(
+                temp_dir, from_type, to_type, attachment)
+
+        return await self.convert_files(
+            temp_dir,
+            from_type,
+            to_type,
+            attachment,
+            self.configs["valid_conversions"][(from_type, to_type)]
         )
 
-        # Stop conversion if an error occurs.
-        if palette_result:
-            return None, palette_result
-
-        # Generate GIF from palette.
-        result = subprocess.call(
-            [
-                "ffmpeg", "-i", input, "-i", palette,
-                "-lavfi", (f"fps={fps},scale=512:-1:flags=lanczos "
-                           + "[x]; [x][1:v] paletteuse"),
-                "-y", output
-            ],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-
-        return output, result
+    def normalize_type(self, filetype: str) -> str:
+        """
+        Lowercase a file extension and resolve any configured alias.
+        """
+        return self.configs["aliases"].get(filetype.lower(), filetype.lower())
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -167,7 +266,10 @@ class Conversion(commands.Cog, name="conversion"):
             return
 
         # Create then cleanup temp directory for ffmpeg input / output files.
-        async with asynctempfile.TemporaryDirectory() as temp:
+        # Supported files are re-uploaded from their downloads, so hold onto
+        # those until the message has been sent.
+        async with (asynctempfile.TemporaryDirectory() as temp,
+                    contextlib.AsyncExitStack() as downloads):
             converted_files, supported_files = [], []
 
             for attachment in message.attachments:
@@ -208,7 +310,9 @@ class Conversion(commands.Cog, name="conversion"):
                             message.author.id
                         )
                 else:
-                    supported_files.append(await attachment.to_file())
+                    download = await downloads.enter_async_context(
+                        self.bot.downloads.download(attachment))
+                    supported_files.append(download.to_file())
 
             unsupported = len(message.attachments) - len(supported_files)
             converted = len(converted_files)
@@ -258,10 +362,11 @@ class Conversion(commands.Cog, name="conversion"):
                 message.author.id
             )
 
-    @commands.command(
+    @commands.group(
         name="convert",
         usage="convert <to_type>",
-        brief="Convert a file to a different type."
+        brief="Convert a file to a different type.",
+        invoke_without_command=True
     )
     async def convert(self, context: commands.Context, to_type: str) -> None:
         """
@@ -295,20 +400,22 @@ class Conversion(commands.Cog, name="conversion"):
 
         if (from_type, to_type) in self.configs["valid_conversions"]:
             async with asynctempfile.TemporaryDirectory() as temp:
-                if to_type == "gif":
-                    output, result = await self.convert_to_gif(
+                try:
+                    output, result = await self.convert_attachment(
                         temp,
                         from_type,
                         to_type,
                         context.message.attachments[0]
                     )
-                else:
-                    output, result = await self.convert_files(
-                        temp,
+                except Exception as e:
+                    # Reported below as a failed conversion.
+                    output, result = None, None
+                    logger.error(
+                        "Error converting %s.%s (%s): %s",
+                        filename,
                         from_type,
-                        to_type,
-                        context.message.attachments[0],
-                        self.configs["valid_conversions"][(from_type, to_type)]
+                        type(e).__name__,
+                        str(e)
                     )
 
                 # Explicitly check for 0 in case `result` is `None`.
@@ -375,6 +482,167 @@ class Conversion(commands.Cog, name="conversion"):
                 color=colors["red"]
             ))
 
+    @convert.command(
+        name="all",
+        usage="all <to_type> <limit>",
+        brief="Convert every matching file in the channel's history."
+    )
+    async def convert_all(
+        self,
+        context: commands.Context,
+        to_type: str,
+        limit: commands.Range[int, 1, 1000] = 100
+    ) -> None:
+        """
+        The Overseer will look through the last `<limit>` messages in this
+        channel and convert every file it can to `<to_type>`.
+
+        Parameters
+        -----------
+        to_type: str
+            The file type to convert to.
+        limit: int
+            How many messages to look through (defaults to 100).
+        """
+        to_type = self.normalize_type(to_type)
+
+        # Stream the channel history instead of loading it all at once.
+        pending = []
+        async for message in context.channel.history(limit=limit):
+            for attachment in message.attachments:
+                filename, _, from_type = attachment.filename.rpartition(".")
+                from_type = self.normalize_type(from_type)
+
+                if (from_type != to_type and (from_type, to_type)
+                        in self.configs["valid_conversions"]):
+                    pending.append((attachment, filename, from_type))
+
+        if not pending:
+            await context.send(embed=discord.Embed(
+                title="Nothing to Convert!",
+                description=("I couldn't find any files in the last "
+                             + f"**{limit}** messages that I can convert "
+                             + f"to `{to_type}`."),
+                color=colors["red"]
+            ))
+            return
+
+        status = await context.send(embed=discord.Embed(
+            title="File Conversion",
+            description=(f"Converting **{len(pending)}** file"
+                         + f"{'' if len(pending) == 1 else 's'} to "
+                         + f"`{to_type}`. This might take a while..."),
+            color=colors["yellow"]
+        ))
+
+        size_limit = (context.guild.filesize_limit if context.guild
+                      else DEFAULT_FILESIZE_LIMIT)
+
+        counts = {"uploaded": 0, "upload_failed": 0, "too_large": 0}
+
+        async def upload(batch: list[tuple[str, str]]) -> None:
+            try:
+                await context.send(files=[
+                    discord.File(output, filename=filename)
+                    for output, filename in batch
+                ])
+            except discord.HTTPException as e:
+                # 413 is Discord rejecting the upload's size; anything else
+                # (permissions, outages) is a real upload failure.
+                counts["too_large" if e.status == 413 else "upload_failed"] \
+                    += len(batch)
+                logger.error(
+                    "Failed to upload %s converted files (%s): %s",
+                    len(batch),
+                    type(e).__name__,
+                    str(e)
+                )
+            else:
+                counts["uploaded"] += len(batch)
+            finally:
+                remove_files(*(output for output, _ in batch))
+
+        async with asynctempfile.TemporaryDirectory() as temp:
+            failed = 0
+            batch, batch_size = [], 0
+
+            for attachment, filename, from_type in pending:
+                # One bad file shouldn't stop the rest of the batch.
+                try:
+                    output, result = await self.convert_attachment(
+                        temp, from_type, to_type, attachment)
+                except Exception as e:
+                    output, result = None, None
+                    logger.error(
+                        "Error converting %s.%s (%s): %s",
+                        filename,
+                        from_type,
+                        type(e).__name__,
+                        str(e)
+                    )
+
+                # Explicitly check for 0 in case `result` is `None`.
+                if result != 0:
+                    failed += 1
+                    if output:
+                        remove_files(output)
+                    logger.error(
+                        "Failed to convert %s.%s (ID: %s) from %s",
+                        filename,
+                        from_type,
+                        attachment.id,
+                        context.channel
+                    )
+                    continue
+
+                if (size := os.path.getsize(output)) > size_limit:
+                    counts["too_large"] += 1
+                    remove_files(output)
+                    continue
+
+                # Pack files into as few messages as the upload limits allow,
+                # uploading each message as soon as it's full so converted
+                # files don't pile up on disk.
+                if batch and (len(batch) == MAX_FILES_PER_MESSAGE
+                              or batch_size + size > size_limit):
+                    await upload(batch)
+                    batch, batch_size = [], 0
+
+                batch.append((output, f"{filename}.{to_type}"))
+                batch_size += size
+
+            if batch:
+                await upload(batch)
+
+        uploaded = counts["uploaded"]
+
+        # Construct summary for the user.
+        description = (f"Converted and uploaded **{uploaded}** out of "
+                       + f"**{len(pending)}** files to `{to_type}`.")
+        if failed:
+            description += f"\n**{failed}** failed to convert."
+        if counts["too_large"]:
+            description += (f"\n**{counts['too_large']}** were too large to "
+                            + "upload.")
+        if counts["upload_failed"]:
+            description += (f"\n**{counts['upload_failed']}** couldn't be "
+                            + "uploaded.")
+
+        await status.edit(embed=discord.Embed(
+            title="File Conversion",
+            description=description,
+            color=colors["green" if uploaded == len(pending)
+                         else "yellow" if uploaded else "red"]
+        ))
+        logger.info(
+            "Converted and re-uploaded %s of %s files to %s for %s (ID: %s)",
+            uploaded,
+            len(pending),
+            to_type,
+            context.message.author,
+            context.message.author.id
+        )
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Conversion(bot))
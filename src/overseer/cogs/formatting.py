@@ -1,12 +1,19 @@
 # overseer.cogs.formatting
 
-import hashlib
+import asyncio
+import asynctempfile
+import codecs
+import glom
+import io
 import logging
-import random
-import string
+import os
+import time
 from typing import Literal
 
-from utils.configs import load_config
+from utils import calculator, metrics, transforms
+from utils.chunking import chunk_messages, chunk_text
+from utils.configs import load_config, load_config_attr
+from utils.custom_exceptions import CalculationError
 from utils.parsers import parse_mentions
 
 import discord
@@ -16,6 +23,23 @@ from discord.ext import commands
 colors = load_config("colors")
 logger = logging.getLogger()
 
+# Discord's maximum message and embed description lengths, and the combined
+# length of embeds allowed in one message.
+MAX_TEXT_LENGTH = 2000
+MAX_EMBED_LENGTH = 4096
+MAX_EMBEDS_LENGTH = 6000
+
+# Output longer than this many characters is sent as a file by default.
+FILE_THRESHOLD = 8000
+
+# Attachments are hashed in chunks of this size, and in a worker thread once
+# they're larger than the threshold.
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_THREAD_THRESHOLD = 4 * 1024 * 1024
+
+# Text attachments are transformed in chunks of this size as they download.
+FILE_CHUNK_SIZE = 64 * 1024
+
 
 class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
     """
@@ -24,31 +48,176 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.file_threshold = (load_config_attr("formatting", "file_threshold")
+                               or FILE_THRESHOLD)
+
+    async def cog_before_invoke(self, context: commands.Context) -> None:
+        context.started_at = time.perf_counter()
+
+    async def cog_after_invoke(self, context: commands.Context) -> None:
+        # Per-command latency, from argument parsing through to the send.
+        if (started_at := getattr(context, "started_at", None)) is not None:
+            metrics.histogram(f"formatting.{context.command.name}").observe(
+                time.perf_counter() - started_at)
+
+    async def render(
+        self,
+        context: commands.Context,
+        mode: str,
+        msg: str
+    ) -> None:
+        """
+        Send the output of a formatting command in `text` or `embed` mode.
+        Commands call this directly instead of re-invoking `say`, which would
+        look the command up and run every global check a second time.
+        """
+        msg = str(msg)
+
+        with metrics.timer("formatting.render"):
+            if mode not in ("embed", "text"):
+                logger.warning("%s is not a supported mode", mode)
+                await context.send(embed=discord.Embed(
+                    title="Invalid Mode!",
+                    description=(f"I don't currently support `{mode}`. You "
+                                 + "can use either `text` or `embed` mode."),
+                    color=colors["red"]
+                ))
+            elif not msg.strip():
+                await context.send(embed=discord.Embed(
+                    title="Nothing to Say!",
+                    description="The result was empty, so I have nothing to send.",
+                    color=colors["red"]
+                ))
+            elif len(msg) > self.file_threshold:
+                await self.send_as_file(context, msg)
+            elif mode == "embed":
+                # Several embeds fit in a message, within a combined limit.
+                await self.send_pages(context, [
+                    {"embeds": [
+                        discord.Embed(description=chunk, color=colors["green"])
+                        for chunk in chunks
+                    ]}
+                    for chunks in chunk_messages(
+                        msg, MAX_EMBED_LENGTH, MAX_EMBEDS_LENGTH)
+                ])
+            else:
+                await self.send_pages(context, [
+                    {"content": chunk}
+                    for chunk in chunk_text(msg, MAX_TEXT_LENGTH)
+                ])
+
+    async def send_pages(
+        self,
+        context: commands.Context,
+        pages: list[dict]
+    ) -> None:
+        """
+        Queue every page at once so the sends are pipelined. The outbound
+        queue keeps them in order and puts them ahead of bulk traffic.
+        """
+        await asyncio.gather(*(context.send(**page) for page in pages))
+
+    async def send_as_file(
+        self,
+        context: commands.Context,
+        msg: str,
+        filename: str = "output.txt"
+    ) -> None:
+        """
+        Send output that would take too many messages as a text file.
+        """
+        await context.send(
+            embed=discord.Embed(
+                description=(f"The result is **{len(msg)}** characters "
+                             + "long, so here it is as a file."),
+                color=colors["green"]
+            ),
+            file=discord.File(io.BytesIO(msg.encode()), filename=filename)
+        )
+
+    def file_input(
+        self,
+        context: commands.Context,
+        message: str | None
+    ) -> discord.Attachment | None:
+        """
+        The first text file attached to the command, if any. Commands that
+        transform text need either a message or a file.
+        """
+        for attachment in glom.glom(context, "message.attachments", default=[]):
+            if (attachment.filename.lower().endswith(".txt")
+                    or (attachment.content_type or "").startswith("text/")):
+                return attachment
+
+        if message is None:
+            raise commands.MissingRequiredArgument(
+                context.command.clean_params["message"])
 
-        # Set of vowels for b-ify.
-        self.vowels = {"a", "e", "i", "o", "u"}
-
-        # Leetspeak translations.
-        self._A = ("4", "@")
-        self._C = ("(", "<")
-        self._E = ("3")
-        self._L = ("1", "|")
-        self._O = ("0", "()")
-        self._S = ("5", "$", "z")
-        self._T = ("7", "+")
-
-        # Hashlib function mappings.
-        self.hash_funcs = {
-            "cksum": lambda arg: hashlib.md5(arg.encode()).hexdigest(),
-            "md5": lambda arg: hashlib.md5(arg.encode()).hexdigest(),
-            "sha1": lambda arg: hashlib.sha1(arg.encode()).hexdigest(),
-            "sha224": lambda arg: hashlib.sha224(arg.encode()).hexdigest(),
-            "sha256": lambda arg: hashlib.sha256(arg.encode()).hexdigest(),
-            "sha384": lambda arg: hashlib.sha384(arg.encode()).hexdigest(),
-            "sha512": lambda arg: hashlib.sha512(arg.encode()).hexdigest(),
-            "blake2b": lambda arg: hashlib.blake2b(arg.encode()).hexdigest(),
-            "blake2s": lambda arg: hashlib.blake2s(arg.encode()).hexdigest(),
-        }
+        return None
+
+    async def transform_file(
+        self,
+        context: commands.Context,
+        mode: str,
+        attachment: discord.Attachment,
+        pipeline: transforms.Pipeline
+    ) -> None:
+        """
+        Run a text file through a pipeline while it downloads and send the
+        result back as a file, so memory stays bounded by the chunk size
+        rather than the file size.
+        """
+        stream = pipeline.stream()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        filename = (f"{os.path.splitext(attachment.filename)[0]}_"
+                    + f"{context.command.name}.txt")
+
+        async with asynctempfile.TemporaryDirectory() as temp:
+            path = os.path.join(temp, filename)
+
+            with metrics.timer("formatting.file"):
+                with open(path, "w", encoding="utf-8") as file:
+                    try:
+                        async for chunk in self.bot.downloads.stream(
+                                attachment, chunk_size=FILE_CHUNK_SIZE):
+                            if output := stream.feed(decoder.decode(chunk)):
+                                await asyncio.to_thread(file.write, output)
+
+                        output = (stream.feed(decoder.decode(b"", final=True))
+                                  + stream.flush())
+                        await asyncio.to_thread(file.write, output)
+                    except ValueError as e:
+                        await context.send(embed=discord.Embed(
+                            title="File Too Large!",
+                            description=f"I can't transform that file: {e}.",
+                            color=colors["red"]
+                        ))
+                        return
+
+            if not os.path.getsize(path):
+                await context.send(embed=discord.Embed(
+                    title="Nothing to Say!",
+                    description="The result was empty, so I have nothing to send.",
+                    color=colors["red"]
+                ))
+                return
+
+            note = f"Here is `{attachment.filename}`, transformed."
+            try:
+                if mode == "embed":
+                    await context.send(
+                        embed=discord.Embed(description=note, color=colors["green"]),
+                        file=discord.File(path, filename=filename)
+                    )
+                else:
+                    await context.send(
+                        note, file=discord.File(path, filename=filename))
+            except discord.HTTPException:
+                await context.send(embed=discord.Embed(
+                    title="File Too Large!",
+                    description="The result is too large for me to upload.",
+                    color=colors["red"]
+                ))
 
     @commands.hybrid_command(
         name="bify",
@@ -59,13 +228,14 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         self,
         context: commands.Context,
         mode: Literal['embed', 'text'],
-        letter: str,
+        letter: str = None,
         *,
-        message
+        message=None
     ) -> None:
         """
         The Overseer will b-ify each word in your message.
         Choose a custom letter to `<letter>`-ify each word (defaults to :b:).
+        Attach a `.txt` file to b-ify it instead.
 
         Parameters
         -----------
@@ -76,22 +246,22 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         message: str
             The message to b-ify.
         """
-        final_message, letter_emoji = "", ":b:"
-
         # Workaround for optional args since Discord.py doesn't support flags.
-        if len(letter) == 1 and letter.isalpha():
-            letter_emoji = f":regional_indicator_{letter.lower()}:"
-        else:
-            message = f"{letter} {message}"
+        if letter is not None and not (len(letter) == 1 and letter.isalpha()):
+            message = letter if message is None else f"{letter} {message}"
+            letter = None
 
-        for word in parse_mentions(message, self.bot, context.guild).split():
-            if word[0] in self.vowels:
-                final_message += f"{letter_emoji}{word} "
-            else:
-                final_message += f"{letter_emoji}{word[1:]} "
+        if attachment := self.file_input(context, message):
+            spec = f"bify:{letter}" if letter else "bify"
+            await self.transform_file(
+                context, mode, attachment, transforms.compile_pipeline(spec))
+            return
 
-        await context.invoke(
-            self.bot.get_command("say"), mode=mode, msg=final_message)
+        letter_emoji = transforms.letter_emoji(letter)
+        message = transforms.bify(
+            parse_mentions(message, self.bot, context.guild), letter_emoji)
+
+        await self.render(context, mode, message)
 
     @commands.hybrid_command(
         name="calc",
@@ -106,15 +276,34 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         *,
         expression
     ) -> None:
+        """
+        I will evaluate an arithmetic expression for you. Supports numbers,
+        `+ - * / // % **`, constants like `pi` and `e`, and common math
+        functions like `sqrt`, `log`, and `sin`.
+
+        Parameters
+        -----------
+        mode: typing.Literal
+            Whether to embed the response in a container or use plain text.
+        expression: str
+            The expression to evaluate.
+        """
         try:
-            await context.invoke(
-                self.bot.get_command("say"), mode=mode, msg=eval(expression))
+            result = await calculator.calculate_async(expression)
         except SyntaxError:
             await context.send(embed=discord.Embed(
                 title="Invalid Syntax!",
                 description="I can't read the expression you entered.",
                 color=colors["red"]
             ))
+        except CalculationError as e:
+            await context.send(embed=discord.Embed(
+                title="Invalid Expression!",
+                description=f"I can't calculate that: {e}.",
+                color=colors["red"]
+            ))
+        else:
+            await self.render(context, mode, result)
 
     @commands.hybrid_command(
         name="cipher",
@@ -127,10 +316,11 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         mode: Literal['embed', 'text'],
         distance: int,
         *,
-        message
+        message=None
     ) -> None:
         """
-        I will encode your message with a Caesar cipher.
+        I will encode your message with a Caesar cipher. Attach a `.txt`
+        file to encode it instead.
 
         Parameters
         -----------
@@ -141,19 +331,15 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         message: str
             The message to encode.
         """
-        # Initialize character mapping.
-        source = string.ascii_lowercase
-        mapping = source[(distance % 26):] + source[:(distance % 26)]
-
-        # Add uppercase letters to mapping.
-        source += source.upper()
-        mapping += mapping.upper()
+        if attachment := self.file_input(context, message):
+            await self.transform_file(
+                context, mode, attachment,
+                transforms.compile_pipeline(f"cipher:{distance}"))
+            return
 
-        # Apply cipher to message.
-        message = message.translate(str.maketrans(source, mapping))
+        message = transforms.cipher(message, distance)
 
-        await context.invoke(
-            self.bot.get_command("say"), mode=mode, msg=message)
+        await self.render(context, mode, message)
 
     @commands.hybrid_command(
         name="clap",
@@ -165,10 +351,11 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         context: commands.Context,
         mode: Literal['embed', 'text'],
         *,
-        message
+        message=None
     ) -> None:
         """
         I will insert claps between each word in your message.
+        Attach a `.txt` file to clap it instead.
 
         Parameters
         -----------
@@ -177,10 +364,14 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         message: str
             The message to modify.
         """
-        message = " :clap: ".join(message.strip().split())
+        if attachment := self.file_input(context, message):
+            await self.transform_file(
+                context, mode, attachment, transforms.compile_pipeline("clap"))
+            return
 
-        await context.invoke(
-            self.bot.get_command("say"), mode=mode, msg=message)
+        message = transforms.clap(message)
+
+        await self.render(context, mode, message)
 
     @commands.hybrid_command(
         name="expand",
@@ -192,10 +383,11 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         context: commands.Context,
         mode: Literal['embed', 'text'],
         *,
-        message
+        message=None
     ) -> None:
         """
         I will add space between each character in your message.
+        Attach a `.txt` file to expand it instead.
 
         Parameters
         -----------
@@ -204,10 +396,52 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         message: str
             The message to modify.
         """
-        message = " ".join(list(message))
+        if attachment := self.file_input(context, message):
+            await self.transform_file(
+                context, mode, attachment, transforms.compile_pipeline("expand"))
+            return
+
+        message = transforms.expand(message)
+
+        await self.render(context, mode, message)
+
+    @commands.hybrid_command(
+        name="fmt",
+        aliases=["pipe"],
+        usage="fmt <mode> <transforms> <message>",
+        brief="Chain several transforms together."
+    )
+    async def fmt(
+        self,
+        context: commands.Context,
+        mode: Literal['embed', 'text'],
+        pipeline: transforms.PipelineConverter,
+        *,
+        message=None
+    ) -> None:
+        """
+        I will run your message through several transforms in one go.
+        Separate transforms with `|`, e.g. `mock|clap|reverse`. Transforms
+        that take an argument accept it after a colon, e.g. `cipher:3` or
+        `bify:z`. Attach a `.txt` file to transform it instead.
+
+        Parameters
+        -----------
+        mode: typing.Literal
+            Whether to embed the response in a container or use plain text.
+        pipeline: str
+            The transforms to apply, in order, separated by `|`.
+        message: str
+            The message to modify.
+        """
+        if attachment := self.file_input(context, message):
+            await self.transform_file(context, mode, attachment, pipeline)
+            return
+
+        if pipeline.resolve_mentions:
+            message = parse_mentions(message, self.bot, context.guild)
 
-        await context.invoke(
-            self.bot.get_command("say"), mode=mode, msg=message)
+        await self.render(context, mode, pipeline(message))
 
     @commands.hybrid_command(
         name="leetspeak",
@@ -219,10 +453,11 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         context: commands.Context,
         mode: Literal['embed', 'text'],
         *,
-        message
+        message=None
     ) -> None:
         """
         I will translate your message into leetspeak.
+        Attach a `.txt` file to translate it instead.
 
         Parameters
         -----------
@@ -231,32 +466,28 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         message: str
             The message to modify.
         """
-        message = (message.lower().strip()
-                   .replace("a", random.choice(self._A))
-                   .replace("c", random.choice(self._C))
-                   .replace("e", random.choice(self._E))
-                   .replace("l", random.choice(self._L))
-                   .replace("o", random.choice(self._O))
-                   .replace("s", random.choice(self._S))
-                   .replace("t", random.choice(self._T))
-                   )
+        if attachment := self.file_input(context, message):
+            await self.transform_file(
+                context, mode, attachment, transforms.compile_pipeline("leetspeak"))
+            return
 
-        await context.invoke(
-            self.bot.get_command("say"), mode=mode, msg=message)
+        message = transforms.leetspeak(message)
+
+        await self.render(context, mode, message)
 
     @commands.hybrid_command(
         name="cksum",
         aliases=["md5", "sha1", "sha224", "sha256", "sha384",
                  "sha512", "blake2b", "blake2s"],
         usage="cksum <mode> <message>",
-        brief="Compute checksum of a message."
+        brief="Compute checksum of a message or file."
     )
     async def cksum(
         self,
         context: commands.Context,
         mode: Literal['embed', 'text'],
         *,
-        message
+        message=None
     ) -> None:
         """
         Compute the checksum of a message using a selected hashing algorithm.
@@ -264,19 +495,71 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         ```
         md5, sha1, sha224, sha256, sha384, sha512, blake2b, blake2s
         ```
+        Attach files to checksum them instead. When hashing files, you can
+        list several algorithms (or `all`) in place of a message. Any other
+        message is hashed itself, even with files attached.
 
         Parameters
         -----------
         mode: typing.Literal
             Whether to embed the response in a container or use plain text.
         message: str
-            The message to modify.
+            The message to modify, or the algorithms to use for files.
         """
+        algorithm = ("md5" if context.invoked_with == "cksum"
+                     else context.invoked_with)
+
+        attachments = glom.glom(context, "message.attachments", default=[])
+        algorithms = (message or algorithm).lower().replace(",", " ").split()
+
+        # Files are only hashed when the message is a list of algorithms, so
+        # text sent with e.g. an image is still hashed as before.
+        if attachments and algorithms and set(algorithms) <= {
+                "all", *transforms.HASH_ALGORITHMS}:
+            if "all" in algorithms:
+                algorithms = transforms.HASH_ALGORITHMS
+
+            lines = []
+            for attachment in attachments:
+                digests = await self.checksum_attachment(
+                    attachment, tuple(dict.fromkeys(algorithms)))
+                lines.extend(f"{name.upper()} ({attachment.filename}) = {digest}"
+                             for name, digest in digests.items())
+
+            await self.render(context, mode, "\n".join(lines))
+            return
+
+        if message is None:
+            raise commands.MissingRequiredArgument(
+                context.command.clean_params["message"])
+
         parsed_message = parse_mentions(message, self.bot, context.guild)
-        message = self.hash_funcs[context.invoked_with](parsed_message)
+        message = transforms.checksum(parsed_message, algorithm)
+
+        await self.render(context, mode, message)
+
+    async def checksum_attachment(
+        self,
+        attachment: discord.Attachment,
+        algorithms: tuple[str]
+    ) -> dict[str, str]:
+        """
+        Hash an attachment with every algorithm in one pass while it
+        downloads, so memory stays bounded by the chunk size. Large files
+        are hashed in a worker thread (hashlib releases the GIL) to keep the
+        event loop responsive.
+        """
+        hasher = transforms.MultiHash(algorithms)
+        offload = attachment.size > HASH_THREAD_THRESHOLD
+
+        async for chunk in self.bot.downloads.stream(
+                attachment, chunk_size=HASH_CHUNK_SIZE):
+            if offload:
+                await asyncio.to_thread(hasher.update, chunk)
+            else:
+                hasher.update(chunk)
 
-        await context.invoke(
-            self.bot.get_command("say"), mode=mode, msg=message)
+        return hasher.hexdigests()
 
     @commands.hybrid_command(
         name="mock",
@@ -288,10 +571,11 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         context: commands.Context,
         mode: Literal['embed', 'text'],
         *,
-        message
+        message=None
     ) -> None:
         """
         I will mock the message you sent.
+        Attach a `.txt` file to mock it instead.
 
         Parameters
         -----------
@@ -300,16 +584,14 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         message: str
             The message to modify.
         """
-        mocked_message = ""
+        if attachment := self.file_input(context, message):
+            await self.transform_file(
+                context, mode, attachment, transforms.compile_pipeline("mock"))
+            return
 
-        for index, character in enumerate(message.lower().strip()):
-            if index % 2:
-                character = character.upper()
+        message = transforms.mock(message)
 
-            mocked_message += character
-
-        await context.invoke(
-            self.bot.get_command("say"), mode=mode, msg=mocked_message)
+        await self.render(context, mode, message)
 
     @commands.hybrid_command(
         name="reverse",
@@ -322,10 +604,11 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         context: commands.Context,
         mode: Literal['embed', 'text'],
         *,
-        message
+        message=None
     ) -> None:
         """
         I will reverse the message you sent.
+        Attach a `.txt` file to reverse it instead.
 
         Parameters
         -----------
@@ -334,10 +617,15 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         message: str
             The message to modify.
         """
-        message = parse_mentions(message, self.bot, context.guild)[::-1]
+        if attachment := self.file_input(context, message):
+            await self.transform_file(
+                context, mode, attachment, transforms.compile_pipeline("reverse"))
+            return
+
+        message = transforms.reverse(
+            parse_mentions(message, self.bot, context.guild))
 
-        await context.invoke(
-            self.bot.get_command("say"), mode=mode, msg=message)
+        await self.render(context, mode, message)
 
     @commands.hybrid_command(
         name="say",
@@ -363,21 +651,7 @@ class Formatting(commands.Cog, name="formatting (`text` or `embed` mode)"):
         message: str
             The message to modify.
         """
-        if mode == "embed":
-            await context.send(embed=discord.Embed(
-                description=msg,
-                color=colors["green"]
-            ))
-        elif mode == "text":
-            await context.send(msg)
-        else:
-            logger.warning("%s is not a supported mode", mode)
-            await context.send(embed=discord.Embed(
-                title="Invalid Mode!",
-                description=(f"I don't currently support `{mode}`. You can " +
-                             f"use either `text` or `embed` mode."),
-                color=colors["red"]
-            ))
+        await self.render(context, mode, msg)
 
 
 async def setup(bot: commands.Bot):
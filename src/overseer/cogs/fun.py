@@ -1,13 +1,20 @@
 # overseer.cogs.fun
 
 import asyncio
-import json
+import glom
 import logging
 import random
 import re
 
+from utils.cache import TTLCache
 from utils.configs import load_config
+from utils.cooldowns import persistent_cooldown
+from utils.custom_exceptions import CircuitOpenError
+from utils.endpoints import Endpoint
+from utils.outbound import BULK, INTERACTIVE
+from utils.facts import FactPool
 from utils.parsers import parse_mentions
+from utils.polls import POLL_OPTIONS, Poll, PollTracker
 
 import aiohttp
 import discord
@@ -18,10 +25,29 @@ from discord.ext.commands import BucketType
 colors = load_config("colors")
 logger = logging.getLogger()
 
+# Bitcoin prices are fresh for a minute and served stale, while refreshing in
+# the background, for up to ten.
+BITCOIN_URL = "https://api.coindesk.com/v1/bpi/currentprice/BTC.json"
+BITCOIN_TTL = 60
+BITCOIN_STALE_TTL = 600
+
+FACT_URL = "https://uselessfacts.jsph.pl/random.json?language=en"
+FACT_POOL_SIZE = 20
+
+# Failures from the external APIs that commands report instead of raising.
+FETCH_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError,
+                KeyError, ValueError)
+
 
 class Fun(commands.Cog, name="fun"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.coindesk = Endpoint("coindesk", timeout=5.0)
+        self.uselessfacts = Endpoint("uselessfacts", timeout=5.0)
+        self.prices = TTLCache("bitcoin", BITCOIN_TTL, BITCOIN_STALE_TTL)
+        self.facts = FactPool(self.fetch_fact, FACT_POOL_SIZE)
+        self.polls = PollTracker(
+            bot, self.poll_embed, **load_config("polls", required=False))
         self.eight_ball_responses = (
             (
                 ("It is certain.", "green"),
@@ -51,6 +77,30 @@ class Fun(commands.Cog, name="fun"):
             )
         )
 
+    async def cog_load(self) -> None:
+        self.facts.start()
+        self.polls.start()
+
+    async def cog_unload(self) -> None:
+        await self.facts.stop()
+        await self.polls.close()
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(
+        self,
+        payload: discord.RawMessageDeleteEvent
+    ) -> None:
+        # A deleted poll can't be voted on or closed anymore.
+        await self.polls.close_poll(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(
+        self,
+        payload: discord.RawBulkMessageDeleteEvent
+    ) -> None:
+        for message_id in payload.message_ids:
+            await self.polls.close_poll(message_id)
+
     @commands.hybrid_command(
         name="bitcoin",
         usage="bitcoin",
@@ -60,23 +110,53 @@ class Fun(commands.Cog, name="fun"):
         """
         Get the current price of Bitcoin from `coindesk.com`.
         """
-        url = "https://api.coindesk.com/v1/bpi/currentprice/BTC.json"
-        # Asynchronously fetch data from the coindesk API.
-        async with aiohttp.ClientSession() as session:
-            raw_response = await session.get(url)
-            response = await raw_response.text()
-            response = json.loads(response)
-
+        # Everyone asking within the TTL shares one request to coindesk.
+        try:
+            rate, age = await self.prices.get("USD", self.fetch_bitcoin_price)
+        except FETCH_ERRORS as e:
+            logger.warning(
+                "Failed to fetch the price of Bitcoin (%s): %s",
+                type(e).__name__,
+                str(e)
+            )
             await context.send(embed=discord.Embed(
-                title="Current Bitcoin Price :coin:",
-                description=f"${response['bpi']['USD']['rate']}",
-                color=colors["green"]
+                title="Error!",
+                description=("I can't get the price of Bitcoin right now. "
+                             + "Please try again later."),
+                color=colors["red"]
             ))
+            return
+
+        embed = discord.Embed(
+            title="Current Bitcoin Price :coin:",
+            description=f"${rate}",
+            color=colors["green"]
+        )
+        embed.set_footer(text=(
+            "Updated just now" if age < 1
+            else f"Updated {int(age)} second{'s' if int(age) != 1 else ''} ago"))
+
+        await context.send(embed=embed)
+
+    async def fetch_bitcoin_price(self) -> str:
+        # Asynchronously fetch data from the coindesk API.
+        async def fetch():
+            async with self.bot.session.get(BITCOIN_URL) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+
+            return data["bpi"]["USD"]["rate"]
+
+        return await self.coindesk.call(fetch)
 
     """
     Why 1 and 86400?
       - Users should be able to use the command *once* every *86400* seconds.
 
+    Why persistent_cooldown?
+      - It works like commands.cooldown, but the cooldown is saved to disk so
+        restarting the Overseer doesn't hand out a second daily fact.
+
     Why BucketType.user?
       - The cooldown only affects the current user. Other kinds of cooldowns:
         - BucketType.default for a global cooldown.
@@ -89,35 +169,49 @@ class Fun(commands.Cog, name="fun"):
         usage="dailyfact",
         brief="Get your daily dose of knowledge."
     )
-    @commands.cooldown(1, 86400, BucketType.user)
+    @persistent_cooldown(1, 86400, BucketType.user)
     async def dailyfact(self, context: commands.Context) -> None:
         """
         Get a random fact from the Internet once per day per user.
         """
+        # Facts are prefetched in the background, so this is usually instant.
+        try:
+            fact = await self.facts.get()
+        except FETCH_ERRORS as e:
+            logger.warning(
+                "Failed to fetch a daily fact (%s): %s",
+                type(e).__name__,
+                str(e)
+            )
+            await context.send(embed=discord.Embed(
+                title="Error!",
+                description=("I can't get any facts from the Internet "
+                             + "right now. Please try again later."),
+                color=colors["red"]
+            ))
+
+            # Reset user's cooldown since they missed their daily fact.
+            self.dailyfact.reset_cooldown(context)
+            return
+
+        await context.send(embed=discord.Embed(
+            description=fact["text"],
+            color=colors["purple"]
+        ))
+
+    async def fetch_fact(self) -> dict:
         # Asynchronously fetch data from the useless facts API.
-        url = "https://uselessfacts.jsph.pl/random.json?language=en"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, ssl=False) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    await context.send(embed=discord.Embed(
-                        description=data["text"],
-                        color=colors["purple"]
-                    ))
-                else:
-                    logger.warning(
-                        "Failed to fetch a daily fact. Error code: %s",
-                        response.status
-                    )
-                    await context.send(embed=discord.Embed(
-                        title="Error!",
-                        description=("I can't get any facts from the Internet "
-                                     + "right now. Please try again later."),
-                        color=colors["red"]
-                    ))
-
-                    # Reset user's cooldown since they missed their daily fact.
-                    self.dailyfact.reset_cooldown(context)
+        async def fetch():
+            async with self.bot.session.get(FACT_URL) as response:
+                response.raise_for_status()
+                data = await response.json()
+
+            if not isinstance(data, dict) or not {"id", "text"} <= data.keys():
+                raise ValueError("The useless facts API sent an unexpected fact")
+
+            return data
+
+        return await self.uselessfacts.call(fetch)
 
     @commands.hybrid_command(
         name="poll",
@@ -127,25 +221,103 @@ class Fun(commands.Cog, name="fun"):
     async def poll(self, context: commands.Context, *, title) -> None:
         """
         Create a poll that members can vote on.
-        The three default reactions are yes, no, and maybe.
+        The three default reactions are yes, no, and maybe. The results are
+        updated live as people vote.
 
         Parameters
         -----------
         title: str
             What people are going to vote on.
         """
-        embed = discord.Embed(
-            title="A new poll has been created!",
-            description=f"{title}",
-            color=colors["green"]
+        poll = Poll(0, context.channel.id, title, context.author.id,
+                    str(context.author))
+        embed_message = await context.send(embed=self.poll_embed(poll))
+
+        poll.message_id = embed_message.id
+        self.polls.track(poll)
+
+        # Queued together so they're paced as one burst, in order.
+        await asyncio.gather(*(
+            self.bot.outbound.add_reaction(embed_message, emoji)
+            for emoji in POLL_OPTIONS))
+
+    @commands.hybrid_command(
+        name="pollclose",
+        usage="pollclose [message_id]",
+        brief="Close a poll and show the final results."
+    )
+    async def poll_close(
+        self,
+        context: commands.Context,
+        message_id: int = None
+    ) -> None:
+        """
+        Close a poll and show its final results. Reply to the poll, give its
+        message ID, or leave both out to close the latest poll in this
+        channel. Only the poll's creator can close it.
+
+        Parameters
+        -----------
+        message_id: int
+            The ID of the poll's message.
+        """
+        message_id = message_id or glom.glom(
+            context, "message.reference.message_id", default=None)
+        poll = (self.polls.polls.get(message_id) if message_id
+                else self.polls.latest(context.channel.id))
+
+        if poll is None:
+            await context.send(embed=discord.Embed(
+                title="Poll Not Found!",
+                description="I couldn't find an open poll to close.",
+                color=colors["red"]
+            ))
+            return
+
+        if (context.author.id != poll.author_id
+                and not await self.bot.is_owner(context.author)):
+            await context.send(embed=discord.Embed(
+                title="Not Your Poll!",
+                description=f"Only **{poll.author}** can close this poll.",
+                color=colors["red"]
+            ))
+            return
+
+        await self.polls.close_poll(poll.message_id)
+
+        # Results come from the tally, so the reactions are never fetched.
+        embed = self.poll_embed(poll, closed=True)
+        if channel := self.bot.get_channel(poll.channel_id):
+            try:
+                await self.bot.outbound.edit(
+                    channel.get_partial_message(poll.message_id),
+                    embed=embed, priority=INTERACTIVE)
+            except discord.HTTPException:
+                pass
+
+        await context.send(embed=embed)
+
+    def poll_embed(self, poll: Poll, closed: bool = False) -> discord.Embed:
+        total = poll.total
+        results = "\n".join(
+            f"{emoji} {name}: **{poll.counts[emoji]}**"
+            + (f" ({poll.counts[emoji] / total:.0%})" if total else "")
+            for emoji, name in POLL_OPTIONS.items()
         )
-        embed.set_footer(
-            text=f"Poll created by: {context.message.author} • React to vote!"
+
+        embed = discord.Embed(
+            title=("The poll has closed!" if closed
+                   else "A new poll has been created!"),
+            description=f"{poll.title}\n\n{results}",
+            color=colors["purple" if closed else "green"]
         )
-        embed_message = await context.send(embed=embed)
-        await embed_message.add_reaction("👍")
-        await embed_message.add_reaction("👎")
-        await embed_message.add_reaction("🤷")
+        embed.set_footer(text=(
+            f"Poll created by: {poll.author} • "
+            + (f"{total} vote{'' if total == 1 else 's'}" if closed
+               else "React to vote!")
+        ))
+
+        return embed
 
     @commands.hybrid_command(
         name="rps",
@@ -175,18 +347,20 @@ class Fun(commands.Cog, name="fun"):
         options_msg = await context.send(embed=embed)
 
         # Add each choice as a reaction to the message.
-        for emoji in reactions:
-            await options_msg.add_reaction(emoji)
+        await asyncio.gather(*(
+            self.bot.outbound.add_reaction(options_msg, emoji)
+            for emoji in reactions))
 
         try:
-            reaction, _ = await self.bot.wait_for(
-                "reaction_add",
+            # Raw events are routed straight to this message's waiter.
+            payload = await self.bot.interactions.wait(
+                options_msg.id,
                 timeout=10,
-                check=lambda reaction, user: (user == context.message.author
-                                              and str(reaction) in reactions)
+                check=lambda payload: (payload.user_id == context.author.id
+                                       and str(payload.emoji) in reactions)
             )
 
-            user_choice_emote = reaction.emoji
+            user_choice_emote = str(payload.emoji)
             user_choice_id = reactions[user_choice_emote]
 
             bot_choice_emote = random.choice(tuple(reactions.keys()))
@@ -198,7 +372,7 @@ class Fun(commands.Cog, name="fun"):
                 icon_url=context.author.avatar
             )
 
-            await options_msg.clear_reactions()
+            await self.bot.outbound.clear_reactions(options_msg)
 
             choices_msg = (f"You chose {user_choice_emote} and "
                            + f"I chose {bot_choice_emote}.")
@@ -215,11 +389,12 @@ class Fun(commands.Cog, name="fun"):
             else:
                 result_embed.description = f"**I won!**\n{choices_msg}"
                 result_embed.color = colors["red"]
-                await options_msg.add_reaction("🇱")
+                await self.bot.outbound.add_reaction(options_msg, "🇱")
 
-            await options_msg.edit(embed=result_embed)
-        except asyncio.exceptions.TimeoutError:
-            await options_msg.clear_reactions()
+            await self.bot.outbound.edit(
+                options_msg, embed=result_embed, priority=INTERACTIVE)
+        except asyncio.TimeoutError:
+            await self.bot.outbound.clear_reactions(options_msg)
 
             timeout_embed = discord.Embed(
                 title="Too late slowpoke! I don't wanna play anymore!",
@@ -230,7 +405,8 @@ class Fun(commands.Cog, name="fun"):
                 icon_url=context.author.avatar
             )
 
-            await options_msg.edit(embed=timeout_embed)
+            await self.bot.outbound.edit(
+                options_msg, embed=timeout_embed, priority=INTERACTIVE)
 
     @commands.hybrid_command(
         name="spam",
@@ -268,9 +444,13 @@ class Fun(commands.Cog, name="fun"):
 
         emojis = (":monkey:", ":monkey_face:",
                   ":hippopotamus:", ":lion:", ":pig:")
-        for _ in range(amount):
-            message = " ".join([random.choice(emojis) for _ in range(10)])
-            await member.send(message)
+        # Queued as bulk sends, so they're paced and don't hold up replies.
+        await asyncio.gather(*(
+            self.bot.outbound.send(
+                member,
+                " ".join([random.choice(emojis) for _ in range(10)]),
+                priority=BULK)
+            for _ in range(amount)))
 
     @commands.hybrid_command(
         name="8ball",
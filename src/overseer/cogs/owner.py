@@ -1,9 +1,11 @@
 # overseer.cogs.owner
 
 import glom
+import io
 import json
 import logging
 
+from utils import metrics
 from utils.configs import load_config
 
 import discord
@@ -220,6 +222,44 @@ class Owner(commands.Cog, name="owner"):
         await self.bot.tree.sync(guild=guild)
         await context.send("Done")
 
+    @commands.hybrid_command(
+        name="metrics",
+        usage="metrics <prefix>",
+        brief="Dump the Overseer's metrics."
+    )
+    @commands.is_owner()
+    async def metrics(self, context: commands.Context, prefix: str = "") -> None:
+        """
+        Dump my counters and latency histograms, such as the ones for the
+        external APIs under `endpoints`. Only the Overseer's owner can do this.
+
+        Parameters
+        -----------
+        prefix: str
+            Only show metrics whose names start with this.
+        """
+        snapshot = metrics.snapshot(prefix)
+        lines = [f"{name}: {value:g}"
+                 for kind in ("counters", "gauges")
+                 for name, value in snapshot[kind].items()]
+        lines += [
+            f"{name}: n={summary['count']} "
+            + " ".join(f"{stat}={summary[stat] * 1000:.1f}ms"
+                       for stat in ("mean", "p50", "p90", "p99", "max"))
+            for name, summary in snapshot["histograms"].items()
+        ]
+
+        if not lines:
+            await context.send(embed=discord.Embed(
+                description=f"There are no metrics starting with `{prefix}`.",
+                color=colors["red"]
+            ))
+        elif len(output := "\n".join(lines)) > 1900:
+            await context.send(file=discord.File(
+                io.BytesIO(output.encode()), filename="metrics.txt"))
+        else:
+            await context.send(f"```\n{output}\n```")
+
     @commands.hybrid_command(
         name="shutdown",
         usage="shutdown",
@@ -0,0 +1,121 @@
+# overseer.utils.cache
+
+import asyncio
+import collections
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from utils import metrics
+
+logger = logging.getLogger()
+
+
+class TTLCache:
+    """
+    Caches the results of async loaders for `ttl` seconds.
+
+    Concurrent misses for the same key share a single call to the loader.
+    Entries older than `ttl` but younger than `stale_ttl` are still served
+    while one background call refreshes them, so only the first caller after
+    an entry has fully expired waits on the upstream.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: float | None = None,
+        max_size: int = 1024
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl or ttl, ttl)
+        self.max_size = max_size
+
+        # Key to (value, monotonic time it was loaded).
+        self._entries: collections.OrderedDict[
+            Hashable, tuple[Any, float]] = collections.OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, float]:
+        """
+        Return the cached value for `key` and its age in seconds, calling
+        `loader` if there is no usable entry.
+        """
+        if (entry := self._entries.get(key)) is not None:
+            # Least recently used entries are evicted first.
+            self._entries.move_to_end(key)
+            age = time.monotonic() - entry[1]
+
+            if age < self.ttl:
+                metrics.counter(f"cache.{self.name}.hits").inc()
+                return entry[0], age
+
+            if age < self.stale_ttl:
+                metrics.counter(f"cache.{self.name}.stale").inc()
+                self._load(key, loader)
+                return entry[0], age
+
+        metrics.counter(f"cache.{self.name}.misses").inc()
+
+        # Shield so one cancelled caller doesn't cancel the shared load.
+        value, loaded_at = await asyncio.shield(self._load(key, loader))
+        return value, time.monotonic() - loaded_at
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]]
+    ) -> asyncio.Task:
+        """
+        Start a load of `key`, or return the one already in flight.
+        """
+        if (task := self._inflight.get(key)) is not None:
+            metrics.counter(f"cache.{self.name}.coalesced").inc()
+            return task
+
+        task = self._inflight[key] = asyncio.ensure_future(
+            self._fetch(key, loader))
+        task.add_done_callback(lambda task: self._finish(key, task))
+
+        return task
+
+    async def _fetch(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, float]:
+        metrics.counter(f"cache.{self.name}.loads").inc()
+        entry = (await loader(), time.monotonic())
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        return entry
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+
+        # Background refreshes have no caller to report failures to.
+        if not task.cancelled() and (error := task.exception()) is not None:
+            metrics.counter(f"cache.{self.name}.errors").inc()
+            logger.warning(
+                "Failed to load %s for the %s cache (%s): %s",
+                key,
+                self.name,
+                type(error).__name__,
+                str(error)
+            )
@@ -0,0 +1,225 @@
+# overseer.utils.calculator
+
+import ast
+import asyncio
+import functools
+import math
+import operator
+
+from utils.custom_exceptions import CalculationError
+
+# Budgets that keep every evaluation small and fast.
+MAX_EXPRESSION_LENGTH = 1000   # Characters in the expression.
+MAX_STEPS = 500                # AST nodes evaluated.
+MAX_INT_BITS = 4096            # Size of any integer operand or result.
+MAX_EXPONENT = 10000           # Magnitude of any exponent.
+MAX_FACTORIAL = 500            # Largest argument to factorial.
+TIMEOUT = 2.0                  # Seconds before giving up on an evaluation.
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+CONSTANTS = {
+    "pi": math.pi,
+    "e": math.e,
+    "tau": math.tau,
+    "inf": math.inf,
+}
+
+
+def _factorial(n: int) -> int:
+    if not isinstance(n, int) or not 0 <= n <= MAX_FACTORIAL:
+        raise CalculationError(
+            f"factorial only accepts integers from 0 to {MAX_FACTORIAL}")
+
+    return math.factorial(n)
+
+
+FUNCTIONS = {
+    "abs": abs,
+    "acos": math.acos,
+    "asin": math.asin,
+    "atan": math.atan,
+    "ceil": math.ceil,
+    "cos": math.cos,
+    "degrees": math.degrees,
+    "exp": math.exp,
+    "factorial": _factorial,
+    "floor": math.floor,
+    "gcd": math.gcd,
+    "hypot": math.hypot,
+    "log": math.log,
+    "log10": math.log10,
+    "log2": math.log2,
+    "max": max,
+    "min": min,
+    "radians": math.radians,
+    "round": round,
+    "sin": math.sin,
+    "sqrt": math.sqrt,
+    "tan": math.tan,
+}
+
+
+class Expression:
+    """
+    A parsed and validated arithmetic expression. `heavy` is set when the
+    expression contains operations (powers and function calls) whose cost
+    depends on the size of their operands.
+    """
+
+    def __init__(self, tree: ast.Expression):
+        self.tree = tree
+        self.heavy = any(isinstance(node, (ast.Pow, ast.Call))
+                         for node in ast.walk(tree))
+
+    def evaluate(self) -> int | float:
+        return self._evaluate(self.tree.body)
+
+    def _evaluate(self, node: ast.AST) -> int | float:
+        match node:
+            case ast.Constant(value=value):
+                result = value
+            case ast.Name(id=name):
+                result = CONSTANTS[name]
+            case ast.UnaryOp(op=op, operand=operand):
+                result = UNARY_OPERATORS[type(op)](self._evaluate(operand))
+            case ast.BinOp(left=left, op=op, right=right):
+                left, right = self._evaluate(left), self._evaluate(right)
+                _check_operation(op, left, right)
+                result = BINARY_OPERATORS[type(op)](left, right)
+            case ast.Call(func=ast.Name(id=name), args=args):
+                args = [self._evaluate(arg) for arg in args]
+                _check_call(name, args)
+                result = FUNCTIONS[name](*args)
+
+        if isinstance(result, int) and result.bit_length() > MAX_INT_BITS:
+            raise CalculationError("the result is too large")
+
+        return result
+
+
+def _check_operation(op: ast.operator, left: int | float, right: int | float) -> None:
+    """
+    Reject integer operations whose result would blow past the size budget
+    before spending any time computing them.
+    """
+    if not (isinstance(left, int) and isinstance(right, int)):
+        return
+
+    if isinstance(op, ast.Pow):
+        if abs(right) > MAX_EXPONENT:
+            raise CalculationError(f"exponents are limited to {MAX_EXPONENT}")
+        if right > 0 and (abs(left).bit_length() - 1) * right > MAX_INT_BITS:
+            raise CalculationError("the result is too large")
+    elif isinstance(op, ast.Mult):
+        if left.bit_length() + right.bit_length() > MAX_INT_BITS + 1:
+            raise CalculationError("the result is too large")
+
+
+def _check_call(name: str, args: list[int | float]) -> None:
+    """
+    Reject function arguments that would make the call itself run away, like
+    `round(1, -(10 ** 1000))`, which builds a power of ten with as many
+    digits as its second argument.
+    """
+    for arg in args:
+        if isinstance(arg, int) and arg.bit_length() > MAX_INT_BITS:
+            raise CalculationError(f"the arguments to `{name}` are too large")
+
+    if (name == "round" and len(args) == 2 and isinstance(args[1], int)
+            and abs(args[1]) > MAX_EXPONENT):
+        raise CalculationError(
+            f"`round` can only round to {MAX_EXPONENT} digits")
+
+
+def _validate(node: ast.AST) -> int:
+    """
+    Check that a node only contains numbers, whitelisted constants,
+    arithmetic operators, and calls to whitelisted functions. Returns the
+    number of nodes, i.e. the number of steps evaluation will take.
+    """
+    match node:
+        case ast.Constant(value=value) if (isinstance(value, (int, float))
+                                           and not isinstance(value, bool)):
+            return 1
+        case ast.Name(id=name) if name in CONSTANTS:
+            return 1
+        case ast.UnaryOp(op=op, operand=operand) if type(op) in UNARY_OPERATORS:
+            return 1 + _validate(operand)
+        case ast.BinOp(left=left, op=op, right=right) if (
+                type(op) in BINARY_OPERATORS):
+            return 1 + _validate(left) + _validate(right)
+        case ast.Call(func=ast.Name(id=name), args=args, keywords=[]) if (
+                name in FUNCTIONS):
+            return 1 + sum(map(_validate, args))
+        case ast.Name(id=name) if name in FUNCTIONS:
+            raise CalculationError(f"`{name}` needs to be called")
+        case ast.Name(id=name):
+            raise CalculationError(f"I don't know what `{name}` is")
+        case _:
+            raise CalculationError(
+                f"`{ast.unparse(node)[:50]}` is not allowed in calculations")
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expression: str) -> Expression:
+    """
+    Parse an expression into a restricted AST. Raises `SyntaxError` if it
+    can't be parsed and `CalculationError` if it isn't plain arithmetic.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculationError("the expression is too long")
+
+    tree = ast.parse(expression.strip(), mode="eval")
+    try:
+        steps = _validate(tree.body)
+    except RecursionError:
+        steps = MAX_STEPS + 1
+
+    if steps > MAX_STEPS:
+        raise CalculationError("the expression is too long to evaluate")
+
+    return Expression(tree)
+
+
+def calculate(expression: str) -> int | float:
+    try:
+        return compile_expression(expression).evaluate()
+    except CalculationError:
+        raise
+    except OverflowError:
+        raise CalculationError("the result is too large")
+    except (ArithmeticError, ValueError, TypeError, RecursionError) as e:
+        raise CalculationError(str(e))
+
+
+async def calculate_async(
+    expression: str,
+    timeout: float = TIMEOUT
+) -> int | float:
+    """
+    Evaluate an expression without stalling the event loop. Cheap
+    expressions run inline and heavy ones run in a worker thread.
+    """
+    compiled = compile_expression(expression)
+    if not compiled.heavy:
+        return calculate(expression)
+
+    try:
+        return await asyncio.wait_for(
+            asyncio.to_thread(calculate, expression), timeout)
+    except asyncio.TimeoutError:
+        raise CalculationError("the expression took too long to evaluate")
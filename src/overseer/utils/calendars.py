@@ -0,0 +1,800 @@
+# overseer.utils.calendars
+
+import asyncio
+import bisect
+import copy
+import datetime
+from dateutil import rrule
+import hashlib
+import heapq
+import icalendar
+import itertools
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+
+from utils import metrics
+
+import aiohttp
+import discord
+
+logger = logging.getLogger()
+
+# Overseer-specific fields in an event's description.
+CHANNELS_PATTERN = re.compile(r"(?<=CHANNELS: )\d+[^\\\n]*")
+EPISODE_PATTERN = re.compile(r"(?<=EPISODE: )[^\\\n]*")
+LEAD_PATTERN = re.compile(r"(?<=LEAD: )\d+[^\\\n]*")
+MOVIE_PATTERN = re.compile(r"(?<=MOVIE: )[^\\\n]*")
+
+# Upper bound for open-ended range queries.
+FOREVER = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+
+# Rule frequencies whose periods have a fixed length in wall time, so a
+# query can restart the rule a whole number of periods after DTSTART.
+FIXED_PERIODS = {
+    "WEEKLY": datetime.timedelta(weeks=1),
+    "DAILY": datetime.timedelta(days=1),
+    "HOURLY": datetime.timedelta(hours=1),
+    "MINUTELY": datetime.timedelta(minutes=1),
+    "SECONDLY": datetime.timedelta(seconds=1),
+}
+
+# Errors worth retrying a notification after.
+TRANSIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError,
+                    discord.DiscordServerError)
+
+
+def _as_aware(dt: datetime.datetime) -> datetime.datetime:
+    # Floating (naive) times are in the bot's local time zone.
+    return dt if dt.tzinfo else dt.astimezone()
+
+
+def _as_list(value: Any) -> list:
+    # Properties that can repeat are only lists when they do.
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _localize(
+    dt: datetime.datetime,
+    tz: datetime.tzinfo | None
+) -> datetime.datetime:
+    # Attach a time zone to a wall time, including pytz zones, which need
+    # `localize` to pick the right UTC offset.
+    if tz is None:
+        return dt.astimezone()
+    if hasattr(tz, "localize"):
+        return tz.normalize(tz.localize(dt))
+    return dt.replace(tzinfo=tz)
+
+
+class Event:
+    """
+    A calendar event with the parts of its description the Overseer uses
+    already pulled out.
+    """
+
+    __slots__ = ("uid", "summary", "start", "end", "description", "channels",
+                 "attendees", "episodes", "movies", "leads")
+
+    def __init__(self, vevent: icalendar.Event):
+        self.uid = str(vevent.get("uid", ""))
+        self.summary = str(vevent.get("summary", ""))
+        self.start = _as_aware(vevent.get("dtstart").dt)
+        self.end = (_as_aware(vevent.get("dtend").dt) if vevent.get("dtend")
+                    else self.start)
+        self.description = description = str(vevent.get("description", ""))
+
+        # Get appropriate channels to send the notification to. Events
+        # without any use the scheduler's default channel.
+        channels = CHANNELS_PATTERN.findall(description)
+        self.channels = ([int(c.strip()) for c in channels[0].split(",")]
+                         if channels else [])
+
+        attendees = vevent.get("attendee", [])
+        if isinstance(attendees, str):
+            attendees = [attendees]
+        self.attendees = [int(attendee) for attendee in attendees]
+
+        # Get episodes and movies to watch.
+        self.episodes = [
+            {"show": show, "episode": episode}
+            for show, _, episode in (
+                e.partition("::") for e in EPISODE_PATTERN.findall(description))
+        ]
+        self.movies = MOVIE_PATTERN.findall(description)
+
+        # Minutes before the start to notify at, e.g. `LEAD: 60, 5`. Events
+        # without one use the scheduler's default lead times.
+        leads = LEAD_PATTERN.findall(description)
+        self.leads = ([datetime.timedelta(minutes=int(lead.strip()))
+                       for lead in leads[0].split(",")] if leads else [])
+
+    @property
+    def targets(self) -> list[str]:
+        """
+        Everyone notified about this event, as `channel:<id>` or `user:<id>`.
+        """
+        return ([f"channel:{channel}" for channel in self.channels]
+                + [f"user:{attendee}" for attendee in self.attendees])
+
+    def at(self, start: datetime.datetime) -> "Event":
+        """
+        A copy of this event moved to start at `start`.
+        """
+        occurrence = copy.copy(self)
+        occurrence.end = start + (self.end - self.start)
+        occurrence.start = start
+        return occurrence
+
+
+class Recurrence:
+    """
+    An event with RRULE, RDATE, or EXDATE properties.
+
+    Occurrences are generated lazily, only for the ranges asked for, so a
+    rule without an end never becomes an unbounded list. Rules with a fixed
+    period and no COUNT are restarted just before each new range rather
+    than at DTSTART, so the cost of a query doesn't grow with the event's
+    history. The occurrences of the last range are memoized along with the
+    generator, so queries inside it are free and overlapping ranges moving
+    forward (like the scheduler's window) pick up where the last one
+    stopped.
+    """
+
+    __slots__ = ("event", "source", "dtstart", "rules", "dates", "exdates",
+                 "tz", "_memo")
+
+    def __init__(
+        self,
+        event: Event,
+        vevent: icalendar.Event,
+        overridden: list[datetime.datetime]
+    ):
+        self.event = event
+        # Unchanged recurrences are carried over when the file is re-parsed.
+        self.source = (vevent.to_ical(), tuple(overridden))
+
+        # Rules are expanded in the event's wall time so occurrences keep
+        # their time of day across DST changes.
+        start = vevent.get("dtstart").dt
+        self.tz = start.tzinfo
+        start = self.dtstart = start.replace(tzinfo=None)
+
+        # Each rule with its period, if it can be restarted mid-history.
+        self.rules = [
+            (rrule.rrulestr(self._rule(recur), dtstart=start),
+             self._period(recur))
+            for recur in _as_list(vevent.get("rrule"))
+        ]
+
+        # Sorted, so a query only adds the dates from its range onwards.
+        self.dates, self.exdates = [start], []
+        for name, dates in (("rdate", self.dates), ("exdate", self.exdates)):
+            for values in _as_list(vevent.get(name)):
+                for date in values.dts:
+                    if isinstance(date.dt, datetime.datetime):
+                        dates.append(self._wall(date.dt))
+
+        # Occurrences with their own VEVENT (a RECURRENCE-ID) are indexed
+        # separately.
+        self.exdates += [self._wall(date) for date in overridden]
+        self.dates.sort()
+        self.exdates.sort()
+
+        self._memo = None
+
+    def between(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime
+    ) -> list[Event]:
+        # Restart unless the range overlaps the memo and moves forward, so
+        # a jump ahead doesn't generate everything in between.
+        if (self._memo is None or start < self._memo[0]
+                or start >= self._memo[1]):
+            occurrences = self._occurrences(start)
+            self._memo = (start, start, [], occurrences, next(occurrences, None))
+            metrics.counter("calendar.expansions").inc()
+
+        _, until, events, occurrences, pending = self._memo
+        if end > until:
+            # Drop what's now behind the range and generate up to its end.
+            events = [event for event in events if event.start >= start]
+            while pending is not None and pending.start < end:
+                events.append(pending)
+                pending = next(occurrences, None)
+            self._memo = (start, end, events, occurrences, pending)
+
+        return [event for event in events if start <= event.start < end]
+
+    def iter_between(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime
+    ) -> Iterator[Event]:
+        """
+        Occurrences starting in a range, generated one at a time without
+        touching the memo. For queries that only need the first few.
+        """
+        return itertools.takewhile(lambda event: event.start < end,
+                                   self._occurrences(start))
+
+    def _occurrences(self, start: datetime.datetime) -> Iterator[Event]:
+        # A day of slack covers any difference between the event's UTC
+        # offset and the query's.
+        after = self._wall(start) - datetime.timedelta(days=1)
+        for wall in self._rules(after).xafter(after, inc=True):
+            if (occurrence := _localize(wall, self.tz)) >= start:
+                yield self.event.at(occurrence)
+
+    def _rules(self, after: datetime.datetime) -> rrule.rruleset:
+        """
+        The event's rules, restarted as close before `after` as they can be
+        without changing which occurrences they generate.
+        """
+        rules = rrule.rruleset()
+
+        for rule, period in self.rules:
+            # A whole number of periods keeps the weekday and time of day
+            # that default from DTSTART, and the alignment of INTERVAL.
+            dtstart = self.dtstart
+            if period is not None and after > dtstart:
+                dtstart += (after - dtstart) // period * period
+                rule = rule.replace(dtstart=dtstart)
+            rules.rrule(rule)
+
+        for dates, add in ((self.dates, rules.rdate),
+                           (self.exdates, rules.exdate)):
+            for date in dates[bisect.bisect_left(dates, after):]:
+                add(date)
+
+        return rules
+
+    def _wall(self, dt: datetime.datetime) -> datetime.datetime:
+        if dt.tzinfo is None:
+            return dt
+        return (dt.astimezone(self.tz) if self.tz else
+                dt.astimezone()).replace(tzinfo=None)
+
+    @staticmethod
+    def _period(recur: icalendar.vRecur) -> datetime.timedelta | None:
+        # COUNT is counted from DTSTART, so those rules always start there.
+        period = FIXED_PERIODS.get(recur.get("FREQ", [None])[0])
+        if period is None or recur.get("COUNT"):
+            return None
+
+        return period * int(recur.get("INTERVAL", [1])[0])
+
+    def _rule(self, recur: icalendar.vRecur) -> str:
+        # UNTIL is in UTC (or a date) but the rule is expanded in wall time.
+        recur = icalendar.vRecur(recur)
+        if until := recur.get("UNTIL"):
+            until = until[0]
+            if not isinstance(until, datetime.datetime):
+                until = datetime.datetime.combine(until, datetime.time.max)
+            recur["UNTIL"] = [self._wall(until)]
+
+        return recur.to_ical().decode()
+
+
+class CalendarIndex:
+    """
+    An .ics file parsed into events sorted by start time.
+
+    `refresh` only re-parses the file when its modification time or size
+    has changed and its contents hash differently, and `between` answers
+    range queries by binary search, so checking for upcoming events costs
+    O(log n) however large the calendar is. Recurring events are kept
+    apart and only expanded within the range being queried.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        # Start times, events, and recurrences by UID, swapped as one so
+        # readers on the event loop never see a half-built index while
+        # `refresh` runs in a thread.
+        self._index: tuple[list[datetime.datetime], list[Event],
+                           dict[str, Recurrence]] = ([], [], {})
+        self._stat = None
+        self._digest = None
+
+        # The longest `LEAD` of any event, so callers know how far ahead of a
+        # window to look for events that are due inside it.
+        self.longest_lead = datetime.timedelta(0)
+
+    def __len__(self) -> int:
+        return len(self.events) + len(self.recurring)
+
+    @property
+    def events(self) -> list[Event]:
+        return self._index[1]
+
+    @property
+    def recurring(self) -> list[Recurrence]:
+        return list(self._index[2].values())
+
+    def refresh(self) -> bool:
+        """
+        Re-parse the calendar if the file changed. Returns whether the index
+        was rebuilt.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            changed = bool(len(self))
+            self._index = ([], [], {})
+            self._stat = self._digest = None
+            self.longest_lead = datetime.timedelta(0)
+            return changed
+
+        if (stat.st_mtime_ns, stat.st_size) == self._stat:
+            return False
+
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        self._stat = (stat.st_mtime_ns, stat.st_size)
+        digest = hashlib.sha256(data).digest()
+        if digest == self._digest:
+            return False
+
+        start = time.perf_counter()
+        events = []
+        masters = []
+        overridden: dict[str, list[datetime.datetime]] = {}
+        for vevent in icalendar.Calendar.from_ical(data).walk("VEVENT"):
+            # Only events with a time of day can be notified about.
+            if not isinstance(vevent.get("dtstart").dt, datetime.datetime):
+                continue
+
+            if vevent.get("recurrence-id"):
+                overridden.setdefault(str(vevent.get("uid", "")), []).append(
+                    vevent.get("recurrence-id").dt)
+            elif any(vevent.get(name) for name in ("rrule", "rdate")):
+                masters.append(vevent)
+                continue
+
+            try:
+                events.append(Event(vevent))
+            except (ValueError, TypeError) as e:
+                self._skip(vevent, e)
+
+        # Recurrences whose VEVENT and overrides are unchanged keep their
+        # memoized expansions.
+        previous = self._index[2]
+        recurring = {}
+        for vevent in masters:
+            uid = str(vevent.get("uid", ""))
+            try:
+                recurrence = previous.get(uid)
+                if recurrence is None or recurrence.source != (
+                        vevent.to_ical(), tuple(overridden.get(uid, ()))):
+                    recurrence = Recurrence(
+                        Event(vevent), vevent, overridden.get(uid, []))
+                recurring[uid] = recurrence
+            except (ValueError, TypeError) as e:
+                self._skip(vevent, e)
+
+        events.sort(key=lambda event: event.start)
+        self._index = ([event.start for event in events], events, recurring)
+        self._digest = digest
+        self.longest_lead = max(
+            (lead for event in (*events, *(r.event for r in recurring.values()))
+             for lead in event.leads),
+            default=datetime.timedelta(0))
+
+        metrics.histogram("calendar.parse").observe(time.perf_counter() - start)
+        metrics.gauge("calendar.events").set(len(self))
+        logger.info(
+            "Loaded %s events (%s recurring) from %s",
+            len(self),
+            len(recurring),
+            self.path
+        )
+
+        return True
+
+    def between(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        limit: int = None
+    ) -> list[Event]:
+        """
+        Events and occurrences of recurring events starting at or after
+        `start` and before `end`, in order. With `limit`, only the first
+        `limit` are generated.
+        """
+        starts, events, recurring = self._index
+        low = bisect.bisect_left(starts, start)
+        high = bisect.bisect_left(starts, end, lo=low)
+        if limit is not None:
+            high = min(high, low + limit)
+        if not recurring:
+            return events[low:high]
+
+        if limit is None:
+            return list(heapq.merge(
+                events[low:high],
+                *(recurrence.between(start, end)
+                  for recurrence in recurring.values()),
+                key=lambda event: event.start
+            ))
+
+        return list(itertools.islice(heapq.merge(
+            events[low:high],
+            *(recurrence.iter_between(start, end)
+              for recurrence in recurring.values()),
+            key=lambda event: event.start
+        ), limit))
+
+    def after(self, start: datetime.datetime, count: int) -> list[Event]:
+        """
+        The next `count` events starting at or after `start`.
+        """
+        return self.between(start, FOREVER, limit=count)
+
+    def _skip(self, vevent: icalendar.Event, error: Exception) -> None:
+        logger.warning(
+            "Skipping malformed event %s in %s (%s): %s",
+            vevent.get("uid"),
+            self.path,
+            type(error).__name__,
+            str(error)
+        )
+
+
+class NotificationLedger:
+    """
+    Calendar notifications that have been delivered, so each is sent once
+    even across restarts.
+
+    Each delivery is a single key of event UID, occurrence start, lead time,
+    and target, kept until its expiry. Expired keys are evicted lazily from
+    the front of a min-heap, so lookups never scan the history and memory is
+    bounded by the deliveries still inside the catch-up grace period.
+    """
+
+    def __init__(self, path: str = "lists/notifications.json"):
+        self.path = path
+
+        self._entries: dict[str, float] = {}
+        self._expiries: list[tuple[float, str]] = []
+        self._dirty = False
+
+    def __len__(self) -> int:
+        self._evict(time.time())
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        self._evict(time.time())
+        return key in self._entries
+
+    @staticmethod
+    def key(event: Event, lead: datetime.timedelta, target: str) -> str:
+        start = event.start.astimezone(datetime.timezone.utc)
+        lead = int(lead.total_seconds())
+        return f"{event.uid}|{start:%Y%m%dT%H%M%SZ}|{lead}|{target}"
+
+    def record(self, key: str, expiry: float) -> None:
+        self._entries[key] = expiry
+        heapq.heappush(self._expiries, (expiry, key))
+        self._dirty = True
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(
+                "Failed to load notifications from %s (%s): %s",
+                self.path,
+                type(e).__name__,
+                str(e)
+            )
+            return
+
+        now = time.time()
+        self._entries = {key: expiry for key, expiry in entries.items()
+                         if expiry > now}
+        self._expiries = [(expiry, key) for key, expiry in self._entries.items()]
+        heapq.heapify(self._expiries)
+
+    def save(self) -> None:
+        self._write(self._serialize())
+
+    async def close(self) -> None:
+        if self._dirty:
+            self.save()
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+
+        # Serialize on the event loop so entries can't change mid-dump.
+        data = self._serialize()
+        try:
+            await asyncio.to_thread(self._write, data)
+        except OSError as e:
+            self._dirty = True
+            logger.error(
+                "Failed to save notifications to %s (%s): %s",
+                self.path,
+                type(e).__name__,
+                str(e)
+            )
+
+    def _serialize(self) -> str:
+        self._evict(time.time())
+        self._dirty = False
+
+        return json.dumps(self._entries, separators=(",", ":"))
+
+    def _write(self, data: str) -> None:
+        # Write to a temporary file first so a crash can't truncate the store.
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(data)
+        os.replace(temp_path, self.path)
+
+    def _evict(self, now: float) -> None:
+        while self._expiries and self._expiries[0][0] <= now:
+            expiry, key = heapq.heappop(self._expiries)
+            if self._entries.get(key) == expiry:
+                del self._entries[key]
+                self._dirty = True
+
+
+class NotificationScheduler:
+    """
+    Calls `notify` for each target of each event at each of its lead times
+    before it starts.
+
+    Notifications due within the next `window` seconds are kept in a heap
+    and a single timer is armed for the earliest, so nothing runs between
+    notifications except a stat of the calendar file every `watch_interval`
+    seconds. The heap is rebuilt from the index when the file changes and
+    when the window runs out.
+
+    Deliveries are recorded in `ledger`, which can be shared by several
+    schedulers. Notifications that came due in the last `grace` seconds but were never
+    delivered, e.g. while the bot was down, are sent when the heap is built.
+
+    Everything due at once is delivered concurrently, at most
+    `max_concurrent` targets at a time. Each target is independent: one
+    that keeps failing doesn't hold up the rest, and transient errors are
+    retried up to `max_retries` times with exponential backoff.
+
+    Events without a `CHANNELS:` line are also sent to `default_channel`,
+    if there is one.
+    """
+
+    def __init__(
+        self,
+        index: CalendarIndex,
+        notify: Callable[[Event, str, datetime.datetime], Awaitable],
+        ledger: NotificationLedger,
+        lead_times: Iterable[float] = (5.0,),
+        window: float = 3600.0,
+        watch_interval: float = 30.0,
+        grace: float = 900.0,
+        max_concurrent: int = 10,
+        max_retries: int = 2,
+        backoff: float = 1.0,
+        default_channel: int | None = None
+    ):
+        self.index = index
+        self.notify = notify
+        self.default_channel = default_channel
+        self.lead_times = [datetime.timedelta(minutes=lead)
+                           for lead in lead_times]
+        self.window = datetime.timedelta(seconds=window)
+        self.watch_interval = watch_interval
+        self.grace = datetime.timedelta(seconds=grace)
+        self.ledger = ledger
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+        self._ids = itertools.count()
+        self._heap: list[tuple[datetime.datetime, int, tuple, Event]] = []
+        # Notifications already dispatched by this process, until they can no
+        # longer be caught up on.
+        self._fired: dict[tuple, datetime.datetime] = {}
+        self._window_end = None
+        self._timer = None
+        self._task = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._watch())
+
+    async def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def reschedule(self) -> None:
+        """
+        Rebuild the heap from the index and re-arm the timer.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._window_end = now + self.window
+        self._fired = {key: start for key, start in self._fired.items()
+                       if start + self.grace > now}
+
+        # Anything due before the end of the window starts before it plus
+        # the longest lead time. Anything due in the grace period, and not
+        # delivered yet, is sent right away.
+        longest = max(self.lead_times + [self.index.longest_lead])
+        heap = []
+        for event in self.index.between(now - self.grace,
+                                        self._window_end + longest):
+            for lead in event.leads or self.lead_times:
+                key = (event.uid, event.start, lead)
+                due = event.start - lead
+                if (now - self.grace <= due < self._window_end
+                        and key not in self._fired):
+                    heap.append((due, next(self._ids), key, event))
+
+        heapq.heapify(heap)
+        self._heap = heap
+        metrics.gauge("calendar.scheduled").set(len(heap))
+        self._arm()
+
+    def targets(self, event: Event) -> list[str]:
+        if event.channels or self.default_channel is None:
+            return event.targets
+        return [f"channel:{self.default_channel}"] + event.targets
+
+    def _arm(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+
+        # Wake for the next notification, or to refill the heap once the
+        # window runs out.
+        wake = self._heap[0][0] if self._heap else self._window_end
+        delay = (wake - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+        self._timer = asyncio.get_running_loop().call_later(
+            max(delay, 0.0), self._wake)
+
+    def _wake(self) -> None:
+        self._timer = None
+        asyncio.ensure_future(self._fire())
+
+    async def _fire(self) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        try:
+            with metrics.timer("calendar.tick"):
+                deliveries = []
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, key, event = heapq.heappop(self._heap)
+                    self._fired[key] = event.start
+                    metrics.histogram("calendar.lateness").observe(
+                        (now - due).total_seconds())
+
+                    # Kept until the notification can no longer be caught
+                    # up on.
+                    expiry = (event.start + self.grace).timestamp()
+                    for target in self.targets(event):
+                        ledger_key = self.ledger.key(event, key[2], target)
+                        if ledger_key in self.ledger:
+                            metrics.counter("calendar.duplicates").inc()
+                        else:
+                            deliveries.append(
+                                (event, target, ledger_key, expiry))
+
+                start = time.perf_counter()
+                await asyncio.gather(*(self._deliver(*delivery, now, start)
+                                       for delivery in deliveries))
+
+            await self.ledger.flush()
+        except Exception as e:
+            metrics.counter("calendar.tick_errors").inc()
+            logger.error(
+                "Failed to send notifications for %s (%s): %s",
+                self.index.path,
+                type(e).__name__,
+                str(e)
+            )
+        finally:
+            # A failed tick must not leave the scheduler without a timer.
+            metrics.gauge("calendar.scheduled").set(len(self._heap))
+            self._rearm(now)
+
+    def _rearm(self, now: datetime.datetime) -> None:
+        if now >= self._window_end:
+            try:
+                self.reschedule()
+                return
+            except Exception as e:
+                logger.error(
+                    "Failed to schedule notifications for %s (%s): %s",
+                    self.index.path,
+                    type(e).__name__,
+                    str(e)
+                )
+
+                # Try again once the calendar has had a chance to change.
+                self._window_end = now + datetime.timedelta(
+                    seconds=self.watch_interval)
+
+        if self._timer is None:
+            self._arm()
+
+    async def _deliver(
+        self,
+        event: Event,
+        target: str,
+        key: str,
+        expiry: float,
+        now: datetime.datetime,
+        start: float
+    ) -> None:
+        for attempt in itertools.count():
+            try:
+                async with self._semaphore:
+                    await self.notify(event, target, now)
+            except Exception as e:
+                if (isinstance(e, TRANSIENT_ERRORS)
+                        and attempt < self.max_retries):
+                    metrics.counter("calendar.retries").inc()
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+                    continue
+
+                metrics.counter("calendar.failed").inc()
+                logger.error(
+                    "Failed to notify %s about %s (%s): %s",
+                    target,
+                    event.uid,
+                    type(e).__name__,
+                    str(e)
+                )
+                return
+
+            self.ledger.record(key, expiry)
+            metrics.counter("calendar.delivered").inc()
+            # How long this target waited after the tick started.
+            metrics.histogram("calendar.delivery").observe(
+                time.perf_counter() - start)
+            return
+
+    async def _watch(self) -> None:
+        # Only a stat per check unless the file actually changed.
+        while True:
+            try:
+                changed = await asyncio.to_thread(self.index.refresh)
+            except (OSError, ValueError) as e:
+                changed = False
+                logger.error(
+                    "Failed to load calendar from %s (%s): %s",
+                    self.index.path,
+                    type(e).__name__,
+                    str(e)
+                )
+
+            if changed or self._window_end is None:
+                self.reschedule()
+
+            await asyncio.sleep(self.watch_interval)
@@ -0,0 +1,57 @@
+# overseer.utils.chunking
+
+import math
+
+
+def chunk_text(text: str, limit: int) -> list[str]:
+    """
+    Split text into chunks of at most `limit` characters, breaking on a
+    newline in the back half of the window, else the last space or tab,
+    else mid-word. Chunks that would only be whitespace are dropped, since
+    Discord rejects them. Runs in linear time.
+    """
+    chunks, start, length = [], 0, len(text)
+
+    while length - start > limit:
+        end = start + limit
+
+        # A newline near the front of the window would waste most of the
+        # chunk, so only break there if it's in the back half.
+        split = text.rfind("\n", start, end + 1)
+        if split < start + limit // 2:
+            split = max(text.rfind(" ", start, end + 1),
+                        text.rfind("\t", start, end + 1))
+
+        if split <= start:
+            chunk, start = text[start:end], end
+        else:
+            chunk, start = text[start:split], split + 1
+
+        if chunk.strip():
+            chunks.append(chunk)
+
+    if text[start:].strip():
+        chunks.append(text[start:])
+
+    return chunks
+
+
+def chunk_messages(
+    text: str,
+    item_limit: int,
+    total_limit: int
+) -> list[list[str]]:
+    """
+    Split text into the fewest messages of at most `total_limit` characters,
+    each divided into evenly sized items (e.g. embeds) of at most
+    `item_limit` characters.
+    """
+    messages = []
+
+    for message in chunk_text(text, total_limit):
+        # Even pieces, so e.g. 6000 characters becomes two 3000-character
+        # embeds rather than 4096 and 1904.
+        pieces = math.ceil(len(message) / item_limit)
+        messages.append(chunk_text(message, math.ceil(len(message) / pieces)))
+
+    return messages
@@ -8,11 +8,16 @@ import sys
 from typing import Any
 import yaml
 
+# Where configs are read from unless a call says otherwise. Scripts that
+# import cogs (which load their configs at import time) can point this
+# elsewhere first.
+CONFIG_DIR = "~/overseer/.config"
+
 
 def load_bot_configs(
     config_dir: str = None
 ) -> tuple[dict[str, Any], logging.Logger]:
-    config_dir = os.path.expanduser(config_dir or "~/overseer/.config")
+    config_dir = os.path.expanduser(config_dir or CONFIG_DIR)
     bot_config_path = os.path.join(config_dir, "overseer.yaml")
     logger_config_path = os.path.join(config_dir, "logging.yaml")
 
@@ -41,7 +46,7 @@ def load_config(
     default: dict[Any, Any] | list[Any] = {},
     config_dir: str = None
 ) -> dict[Any, Any] | list[Any]:
-    config_dir = os.path.expanduser(config_dir or "~/overseer/.config")
+    config_dir = os.path.expanduser(config_dir or CONFIG_DIR)
     config_path = os.path.join(config_dir, filename + '.yaml')
 
     if os.path.isfile(config_path):
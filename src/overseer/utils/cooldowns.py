@@ -0,0 +1,242 @@
+# overseer.utils.cooldowns
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from typing import Any, Callable
+
+from discord.ext import commands
+from discord.ext.commands import BucketType
+
+logger = logging.getLogger()
+
+
+class CooldownStore:
+    """
+    Command cooldowns that survive restarts.
+
+    Each active cooldown is a single `[expiry, tokens used]` entry keyed by
+    command and bucket, with expiries also kept in a min-heap. Expired entries
+    are evicted lazily from the front of the heap, so memory is bounded by the
+    number of cooldowns that are actually running. Changes are snapshotted to
+    `path` every `snapshot_interval` seconds and when the store is closed.
+    """
+
+    def __init__(
+        self,
+        path: str = "lists/cooldowns.json",
+        snapshot_interval: float = 300.0
+    ):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+
+        self._entries: dict[str, list[float]] = {}
+        self._expiries: list[tuple[float, str]] = []
+        self._dirty = False
+        self._task = None
+
+    def __len__(self) -> int:
+        self._evict(time.time())
+        return len(self._entries)
+
+    def retry_after(self, key: str, rate: int, now: float = None) -> float:
+        now = now or time.time()
+        self._evict(now)
+
+        entry = self._entries.get(key)
+        return entry[0] - now if entry and entry[1] >= rate else 0.0
+
+    def tokens(self, key: str, rate: int, now: float = None) -> int:
+        self._evict(now or time.time())
+
+        entry = self._entries.get(key)
+        return rate - int(entry[1]) if entry else rate
+
+    def update(
+        self,
+        key: str,
+        rate: int,
+        per: float,
+        tokens: int = 1,
+        now: float = None
+    ) -> float | None:
+        """
+        Use `tokens` from a bucket, starting a new window if it has none.
+        Returns the seconds until the window ends if the bucket is empty.
+        """
+        now = now or time.time()
+        self._evict(now)
+
+        if (entry := self._entries.get(key)) is None:
+            entry = self._entries[key] = [now + per, 0]
+            heapq.heappush(self._expiries, (entry[0], key))
+
+        if entry[1] + tokens > rate:
+            return entry[0] - now
+
+        entry[1] += tokens
+        self._dirty = True
+        return None
+
+    def reset(self, key: str) -> None:
+        # The heap entry is dropped lazily once it expires.
+        if self._entries.pop(key, None) is not None:
+            self._dirty = True
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(
+                "Failed to load cooldowns from %s (%s): %s",
+                self.path,
+                type(e).__name__,
+                str(e)
+            )
+            return
+
+        now = time.time()
+        self._entries = {key: entry for key, entry in entries.items()
+                         if entry[0] > now}
+        self._expiries = [(entry[0], key) for key, entry in self._entries.items()]
+        heapq.heapify(self._expiries)
+
+    def save(self) -> None:
+        self._write(self._serialize())
+
+    def _serialize(self) -> str:
+        self._evict(time.time())
+        self._dirty = False
+
+        return json.dumps(self._entries, separators=(",", ":"))
+
+    def _write(self, data: str) -> None:
+        # Write to a temporary file first so a crash can't truncate the store.
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(data)
+        os.replace(temp_path, self.path)
+
+    def start(self) -> None:
+        self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._snapshot())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._dirty:
+            self.save()
+
+    async def _snapshot(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            if not self._dirty:
+                continue
+
+            # Serialize on the event loop so the entries can't change mid-dump.
+            data = self._serialize()
+            try:
+                await asyncio.to_thread(self._write, data)
+            except OSError as e:
+                self._dirty = True
+                logger.error(
+                    "Failed to save cooldowns to %s (%s): %s",
+                    self.path,
+                    type(e).__name__,
+                    str(e)
+                )
+
+    def _evict(self, now: float) -> None:
+        while self._expiries and self._expiries[0][0] <= now:
+            expiry, key = heapq.heappop(self._expiries)
+
+            # Skip heap entries left behind by a reset.
+            if (entry := self._entries.get(key)) and entry[0] == expiry:
+                del self._entries[key]
+                self._dirty = True
+
+
+class PersistentCooldown(commands.Cooldown):
+    """
+    A cooldown bucket whose state lives in the bot's `CooldownStore` rather
+    than in the command.
+    """
+
+    __slots__ = ("store", "key")
+
+    def __init__(self, rate: float, per: float, store: CooldownStore, key: str):
+        super().__init__(rate, per)
+        self.store = store
+        self.key = key
+
+    def get_tokens(self, current: float = None) -> int:
+        return self.store.tokens(self.key, self.rate, current)
+
+    def get_retry_after(self, current: float = None) -> float:
+        return self.store.retry_after(self.key, self.rate, current)
+
+    def update_rate_limit(
+        self,
+        current: float = None,
+        *,
+        tokens: int = 1
+    ) -> float | None:
+        return self.store.update(self.key, self.rate, self.per, tokens, current)
+
+    def reset(self) -> None:
+        self.store.reset(self.key)
+
+    def copy(self) -> "PersistentCooldown":
+        return PersistentCooldown(self.rate, self.per, self.store, self.key)
+
+
+class PersistentCooldownMapping(commands.CooldownMapping):
+    """
+    Hands out `PersistentCooldown` buckets keyed by command and bucket, so
+    nothing is cached on the command itself.
+    """
+
+    def copy(self) -> "PersistentCooldownMapping":
+        return PersistentCooldownMapping(self._cooldown, self._type)
+
+    def get_bucket(
+        self,
+        context: commands.Context,
+        current: float = None
+    ) -> PersistentCooldown:
+        key = f"{context.command.qualified_name}:{self._bucket_key(context)}"
+        return PersistentCooldown(
+            self._cooldown.rate, self._cooldown.per, context.bot.cooldowns, key)
+
+
+def persistent_cooldown(
+    rate: int,
+    per: float,
+    type: BucketType | Callable[[commands.Context], Any] = BucketType.default
+) -> Callable:
+    """
+    Drop-in replacement for `commands.cooldown` that keeps its state in
+    `bot.cooldowns`, so cooldowns are not lost when the bot restarts.
+    """
+    def decorator(func):
+        mapping = PersistentCooldownMapping(commands.Cooldown(rate, per), type)
+        if isinstance(func, commands.Command):
+            func._buckets = mapping
+        else:
+            func.__commands_cooldown__ = mapping
+        return func
+
+    return decorator
@@ -22,3 +22,29 @@ class MemberBlacklisted(commands.CheckFailure):
 
     def __str__(self):
         return f"{self.member.name} is blacklisted. {self.message}"
+
+
+class CalculationError(ValueError):
+    """
+    Custom exception to be thrown when an expression passed to the Overseer's
+    calculator is not allowed or exceeds one of its budgets.
+    """
+
+    def __init__(self, message: str):
+        self.message = message
+
+        super().__init__(self.message)
+
+
+class CircuitOpenError(Exception):
+    """
+    Custom exception to be thrown when a call to an external API is rejected
+    because recent calls to it have kept failing.
+    """
+
+    def __init__(self, endpoint: str, retry_after: float):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+        super().__init__(
+            f"{endpoint} is unavailable, retry in {retry_after:.0f}s")
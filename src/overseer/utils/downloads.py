@@ -0,0 +1,303 @@
+# overseer.utils.downloads
+
+import aiohttp
+import asyncio
+import collections
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO
+from urllib.parse import urlsplit
+
+from utils import metrics
+
+import discord
+
+logger = logging.getLogger()
+
+
+class Download:
+    """
+    The contents of a downloaded attachment, kept in memory when small and
+    spilled to a temporary file on disk when large.
+    """
+
+    def __init__(
+        self,
+        attachment: discord.Attachment,
+        data: bytes | None = None,
+        path: str | None = None
+    ):
+        self.attachment = attachment
+        self.data = data
+        self.path = path
+
+    @property
+    def size(self) -> int:
+        return len(self.data) if self.path is None else os.path.getsize(self.path)
+
+    def open(self) -> BinaryIO:
+        return io.BytesIO(self.data) if self.path is None else open(self.path, "rb")
+
+    async def save(self, fp: str) -> int:
+        """
+        Write the download to `fp` without blocking the event loop.
+        """
+        if self.path is None:
+            await asyncio.to_thread(self._write, fp)
+        else:
+            await asyncio.to_thread(shutil.copyfile, self.path, fp)
+
+        return self.size
+
+    def _write(self, fp: str) -> None:
+        with open(fp, "wb") as file:
+            file.write(self.data)
+
+    def to_file(self, filename: str = None) -> discord.File:
+        """
+        Equivalent of `discord.Attachment.to_file` that reuses the download.
+        The file must be sent before the download is released.
+        """
+        return discord.File(
+            self.open(),
+            filename=filename or self.attachment.filename,
+            description=self.attachment.description,
+            spoiler=self.attachment.is_spoiler()
+        )
+
+
+class DownloadManager:
+    """
+    Shared downloader for Discord attachments.
+
+    Downloads are capped globally and per host, retried with exponential
+    backoff on transient failures, optionally throttled to a maximum
+    bandwidth, and deduplicated so concurrent consumers of the same
+    attachment share a single request. Attachments larger than
+    `spill_threshold` bytes are streamed to disk instead of memory.
+
+    Requests go through `session` when one is given, such as the bot's shared
+    HTTP client, which the manager then leaves open on `close`.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession | None = None,
+        max_concurrent: int = 8,
+        max_per_host: int = 4,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        spill_threshold: int = 8 * 1024 * 1024,
+        bandwidth: int | None = None,
+        chunk_size: int = 64 * 1024,
+        timeout: float = 60.0,
+        spill_dir: str | None = None
+    ):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.spill_threshold = spill_threshold
+        self.bandwidth = bandwidth
+        self.chunk_size = chunk_size
+        # Time out stalled connections rather than long downloads.
+        self.timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=timeout, sock_read=timeout)
+        self.spill_dir = spill_dir
+
+        self._session = session
+        self._owns_session = session is None
+        self._global_limit = asyncio.Semaphore(max_concurrent)
+        self._host_limits = collections.defaultdict(
+            lambda: asyncio.Semaphore(max_per_host))
+
+        # In-flight or held downloads keyed by attachment ID.
+        self._downloads: dict[int, asyncio.Task] = {}
+        self._references: dict[int, int] = collections.defaultdict(int)
+
+        # Token bucket state for the bandwidth cap.
+        self._bandwidth_lock = asyncio.Lock()
+        self._allowance = float(bandwidth or 0)
+        self._last_refill = time.monotonic()
+
+    @asynccontextmanager
+    async def download(
+        self,
+        attachment: discord.Attachment
+    ) -> AsyncIterator[Download]:
+        """
+        Download an attachment, or join a download of it that is already in
+        progress. Any spilled file is removed once every holder is done.
+        """
+        key = attachment.id
+        if key in self._downloads:
+            metrics.counter("downloads.deduplicated").inc()
+        else:
+            self._downloads[key] = asyncio.ensure_future(self._fetch(attachment))
+
+        task = self._downloads[key]
+        self._references[key] += 1
+        try:
+            # Shield so one cancelled consumer doesn't cancel the others.
+            yield await asyncio.shield(task)
+        finally:
+            self._references[key] -= 1
+            if not self._references[key]:
+                del self._references[key]
+                del self._downloads[key]
+                self._discard(task)
+
+    async def stream(
+        self,
+        attachment: discord.Attachment,
+        chunk_size: int = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield an attachment in chunks as it downloads, without holding the
+        whole file. Transient failures are only retried before the first
+        chunk has been yielded.
+        """
+        host = urlsplit(attachment.url).hostname
+        start, size = time.perf_counter(), 0
+
+        async with self._global_limit, self._host_limits[host]:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self.session.get(
+                            attachment.url, timeout=self.timeout) as response:
+                        response.raise_for_status()
+
+                        async for chunk in response.content.iter_chunked(
+                                chunk_size or self.chunk_size):
+                            await self._throttle(len(chunk))
+                            size += len(chunk)
+                            yield chunk
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status = getattr(e, "status", None)
+                    transient = status is None or status == 429 or status >= 500
+
+                    if size or not transient or attempt == self.max_retries:
+                        metrics.counter("downloads.failures").inc()
+                        raise
+
+                    metrics.counter("downloads.retries").inc()
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+                else:
+                    break
+
+        metrics.counter("downloads.completed").inc()
+        metrics.counter("downloads.bytes").inc(size)
+        metrics.histogram("downloads.latency").observe(
+            time.perf_counter() - start)
+
+    async def read(self, attachment: discord.Attachment) -> bytes:
+        async with self.download(attachment) as download:
+            with download.open() as file:
+                return file.read()
+
+    async def close(self) -> None:
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or (self._owns_session and self._session.closed):
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+
+        return self._session
+
+    async def _fetch(self, attachment: discord.Attachment) -> Download:
+        host = urlsplit(attachment.url).hostname
+        start = time.perf_counter()
+
+        async with self._global_limit, self._host_limits[host]:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    download = await self._stream(attachment)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # Client errors other than rate limits won't fix themselves.
+                    status = getattr(e, "status", None)
+                    transient = status is None or status == 429 or status >= 500
+
+                    if not transient or attempt == self.max_retries:
+                        metrics.counter("downloads.failures").inc()
+                        logger.error(
+                            "Failed to download %s (%s): %s",
+                            attachment.filename,
+                            type(e).__name__,
+                            str(e)
+                        )
+                        raise
+
+                    metrics.counter("downloads.retries").inc()
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+                else:
+                    break
+
+        metrics.counter("downloads.completed").inc()
+        metrics.counter("downloads.bytes").inc(download.size)
+        metrics.histogram("downloads.latency").observe(
+            time.perf_counter() - start)
+
+        return download
+
+    async def _stream(self, attachment: discord.Attachment) -> Download:
+        spill = attachment.size > self.spill_threshold
+
+        async with self.session.get(
+                attachment.url, timeout=self.timeout) as response:
+            response.raise_for_status()
+
+            if not spill:
+                buffer = bytearray()
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    await self._throttle(len(chunk))
+                    buffer += chunk
+
+                return Download(attachment, data=bytes(buffer))
+
+            # Keep the extension so tools like ffmpeg can sniff the format.
+            suffix = os.path.splitext(attachment.filename)[1]
+            fd, path = tempfile.mkstemp(suffix=suffix, dir=self.spill_dir)
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        await self._throttle(len(chunk))
+                        await asyncio.to_thread(file.write, chunk)
+            except BaseException:
+                os.remove(path)
+                raise
+
+            return Download(attachment, path=path)
+
+    async def _throttle(self, size: int) -> None:
+        if not self.bandwidth:
+            return
+
+        # Refill the bucket for the time elapsed, then wait off any deficit.
+        async with self._bandwidth_lock:
+            now = time.monotonic()
+            self._allowance = min(
+                self.bandwidth,
+                self._allowance + (now - self._last_refill) * self.bandwidth)
+            self._last_refill = now
+            self._allowance -= size
+
+            if self._allowance < 0:
+                await asyncio.sleep(-self._allowance / self.bandwidth)
+
+    @staticmethod
+    def _discard(task: asyncio.Task) -> None:
+        if not task.done() or task.cancelled() or task.exception():
+            task.cancel()
+            return
+
+        if (path := task.result().path) is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
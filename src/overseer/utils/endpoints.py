@@ -0,0 +1,93 @@
+# overseer.utils.endpoints
+
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from utils import metrics
+from utils.custom_exceptions import CircuitOpenError
+
+import aiohttp
+
+T = TypeVar("T")
+
+
+class Endpoint:
+    """
+    Wrapper for calls to one external API.
+
+    Every call is bounded by `timeout` seconds and its latency and outcome
+    are recorded under `endpoints.<name>.*` in `utils.metrics`. After
+    `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast with `CircuitOpenError` for `reset_timeout` seconds. A single
+    trial call is then let through, which closes the circuit again if it
+    succeeds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args) -> T:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial):
+            metrics.counter(f"endpoints.{self.name}.rejected").inc()
+            raise CircuitOpenError(self.name, self.retry_after)
+
+        self._trial = state == "half-open"
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(func(*args), self.timeout)
+        except asyncio.TimeoutError:
+            metrics.counter(f"endpoints.{self.name}.timeouts").inc()
+            self._record_failure()
+            raise
+        except (aiohttp.ClientError, ValueError, KeyError):
+            # Bad statuses, dropped connections, and malformed payloads.
+            metrics.counter(f"endpoints.{self.name}.errors").inc()
+            self._record_failure()
+            raise
+        finally:
+            self._trial = False
+            metrics.histogram(f"endpoints.{self.name}.latency").observe(
+                time.perf_counter() - start)
+
+        metrics.counter(f"endpoints.{self.name}.successes").inc()
+        self._failures = 0
+        self._opened_at = None
+
+        return result
+
+    @property
+    def retry_after(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def _record_failure(self) -> None:
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                metrics.counter(f"endpoints.{self.name}.opened").inc()
+            self._opened_at = time.monotonic()
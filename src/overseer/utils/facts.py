@@ -0,0 +1,129 @@
+# overseer.utils.facts
+
+import asyncio
+import collections
+import logging
+from typing import Awaitable, Callable
+
+from utils import metrics
+
+logger = logging.getLogger()
+
+
+class FactPool:
+    """
+    Bounded pool of pre-fetched facts, refilled by a background task so
+    commands can answer from memory. Facts are dicts with an "id" and are
+    deduplicated against the pool and the last `history` facts handed out.
+    Failed fetches are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[dict]],
+        size: int = 20,
+        low_water: int | None = None,
+        history: int = 512,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0
+    ):
+        self.fetch = fetch
+        self.size = size
+        self.low_water = size // 2 if low_water is None else low_water
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._pool: collections.deque[dict] = collections.deque()
+        self._seen: collections.deque[str] = collections.deque(maxlen=history)
+        self._wanted = asyncio.Event()
+        self._task = None
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+    def start(self) -> None:
+        """
+        Start the refill task, or restart it if it has died.
+        """
+        if self._task is not None and self._task.done():
+            # Anything that killed the task would otherwise go unnoticed.
+            if not self._task.cancelled() and self._task.exception():
+                e = self._task.exception()
+                logger.error(
+                    "Fact refill task died (%s): %s. Restarting it",
+                    type(e).__name__,
+                    str(e)
+                )
+            self._task = None
+
+        if self._task is None:
+            self._wanted.set()
+            self._task = asyncio.ensure_future(self._refill())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def get(self) -> dict:
+        """
+        Take a fact from the pool, or fetch one directly if the pool has run
+        dry. Only the direct fetch can raise.
+        """
+        if self._task is not None and self._task.done():
+            self.start()
+
+        if self._pool:
+            metrics.counter("facts.pool_hits").inc()
+            fact = self._pool.popleft()
+        else:
+            metrics.counter("facts.pool_misses").inc()
+            fact = await self.fetch()
+
+        self._seen.append(fact["id"])
+        if len(self._pool) <= self.low_water:
+            self._wanted.set()
+
+        return fact
+
+    async def _refill(self) -> None:
+        delay = self.backoff
+
+        while True:
+            await self._wanted.wait()
+
+            while len(self._pool) < self.size:
+                try:
+                    fact = await self.fetch()
+                    fact_id = fact["id"]
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    metrics.counter("facts.fetch_errors").inc()
+                    logger.warning(
+                        "Failed to prefetch a fact (%s): %s. Retrying in %ss",
+                        type(e).__name__,
+                        str(e),
+                        delay
+                    )
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+                    continue
+
+                if (fact_id in self._seen
+                        or any(fact_id == other["id"] for other in self._pool)):
+                    # A small upstream can keep repeating itself, so back off
+                    # on duplicates as well as on errors.
+                    metrics.counter("facts.duplicates").inc()
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+                    continue
+
+                self._pool.append(fact)
+                delay = self.backoff
+
+            self._wanted.clear()
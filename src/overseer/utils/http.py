@@ -0,0 +1,30 @@
+# overseer.utils.http
+
+import aiohttp
+
+
+def create_session(
+    limit: int = 100,
+    limit_per_host: int = 10,
+    dns_cache_ttl: int = 300,
+    connect_timeout: float = 10.0,
+    read_timeout: float = 30.0,
+    keepalive_timeout: float = 30.0
+) -> aiohttp.ClientSession:
+    """
+    Create the bot's shared HTTP client. Connections are pooled and kept
+    alive between requests, DNS lookups are cached, and no single host can
+    take up the whole pool. Must be called from a running event loop.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=dns_cache_ttl,
+        keepalive_timeout=keepalive_timeout
+    )
+
+    # Time out stalled connections and reads rather than long responses.
+    timeout = aiohttp.ClientTimeout(
+        total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
@@ -0,0 +1,207 @@
+# overseer.utils.interactions
+
+import asyncio
+import collections
+import itertools
+import logging
+import math
+import time
+from typing import Callable
+
+from utils import metrics
+
+import discord
+
+logger = logging.getLogger()
+
+ReactionCheck = Callable[[discord.RawReactionActionEvent], bool]
+ReactionHandler = Callable[[str, discord.RawReactionActionEvent], None]
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel. Timers are dropped into one of `slots` buckets by
+    deadline, and a single task advances one bucket every `tick` seconds,
+    firing whatever is due. Scheduling and cancelling are O(1) no matter how
+    many timers are pending, at the cost of up to `tick` seconds of lateness.
+    """
+
+    def __init__(self, tick: float = 0.5, slots: int = 128):
+        self.tick = tick
+        self.slots = [dict() for _ in range(slots)]
+
+        self._ids = itertools.count()
+        self._locations: dict[int, int] = {}
+        self._cursor = math.floor(time.monotonic() / tick)
+        self._task = None
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> int:
+        """
+        Call `callback` after about `delay` seconds. Returns a handle that
+        can be passed to `cancel`.
+        """
+        deadline = time.monotonic() + delay
+        slot = max(math.ceil(deadline / self.tick), self._cursor + 1) % len(self.slots)
+
+        handle = next(self._ids)
+        self.slots[slot][handle] = (deadline, callback)
+        self._locations[handle] = slot
+
+        return handle
+
+    def cancel(self, handle: int) -> None:
+        if (slot := self._locations.pop(handle, None)) is not None:
+            self.slots[slot].pop(handle, None)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._cursor = math.floor(time.monotonic() / self.tick)
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+
+            # Catch up on every bucket passed since the last tick, in case the
+            # event loop was busy.
+            now = time.monotonic()
+            target = math.floor(now / self.tick)
+            for cursor in range(self._cursor + 1, target + 1)[-len(self.slots):]:
+                self._fire(cursor % len(self.slots), now)
+            self._cursor = target
+
+    def _fire(self, slot: int, now: float) -> None:
+        bucket = self.slots[slot]
+
+        # Timers more than one rotation out stay put until a later pass.
+        due = [handle for handle, (deadline, _) in bucket.items()
+               if deadline <= now]
+        for handle in due:
+            _, callback = bucket.pop(handle)
+            del self._locations[handle]
+
+            try:
+                callback()
+            except Exception:
+                logger.exception("Timer callback failed")
+
+
+class ReactionRegistry:
+    """
+    Routes raw reaction events to whatever is waiting on that message.
+
+    `discord.Client.wait_for` runs every pending check against every event,
+    which costs O(waiters) per reaction across all guilds. Here waiters and
+    handlers are indexed by message ID, so each event costs O(1) plus the
+    waiters on its own message, and timeouts share one `TimerWheel` instead
+    of a task each.
+    """
+
+    def __init__(self, tick: float = 0.5, slots: int = 128):
+        self.wheel = TimerWheel(tick, slots)
+
+        # Message ID to one-shot waiters of (event, check, future, timer).
+        self._waiters: dict[int, list[tuple]] = collections.defaultdict(list)
+        # Message ID to long-lived handlers, called for every event.
+        self._handlers: dict[int, ReactionHandler] = {}
+
+    def start(self) -> None:
+        self.wheel.start()
+
+    async def close(self) -> None:
+        await self.wheel.stop()
+
+        for waiters in self._waiters.values():
+            for _, _, future, _ in waiters:
+                future.cancel()
+        self._waiters.clear()
+        self._handlers.clear()
+
+    async def wait(
+        self,
+        message_id: int,
+        event: str = "reaction_add",
+        check: ReactionCheck | None = None,
+        timeout: float | None = None
+    ) -> discord.RawReactionActionEvent:
+        """
+        Wait for the first `event` on a message that passes `check`. Raises
+        `asyncio.TimeoutError` after `timeout` seconds.
+        """
+        future = asyncio.get_running_loop().create_future()
+        timer = None
+        if timeout is not None:
+            timer = self.wheel.schedule(
+                timeout, lambda: self._expire(message_id, future))
+
+        waiter = (event, check, future, timer)
+        self._waiters[message_id].append(waiter)
+        try:
+            return await future
+        finally:
+            self._remove(message_id, waiter)
+
+    def add_handler(self, message_id: int, handler: ReactionHandler) -> None:
+        """
+        Call `handler(event, payload)` for every reaction event on a message
+        until `remove_handler` is called.
+        """
+        self._handlers[message_id] = handler
+
+    def remove_handler(self, message_id: int) -> None:
+        self._handlers.pop(message_id, None)
+
+    def dispatch(self, event: str, payload: discord.RawReactionActionEvent) -> None:
+        """
+        Feed a raw reaction event in from the bot's event handlers.
+        """
+        message_id = payload.message_id
+
+        if (handler := self._handlers.get(message_id)) is not None:
+            metrics.counter("interactions.dispatched").inc()
+            try:
+                handler(event, payload)
+            except Exception:
+                logger.exception("Reaction handler for %s failed", message_id)
+
+        for waiter in self._waiters.get(message_id, ()):
+            waiter_event, check, future, _ = waiter
+            if waiter_event != event or future.done():
+                continue
+
+            try:
+                if check is not None and not check(payload):
+                    continue
+            except Exception as e:
+                future.set_exception(e)
+                continue
+
+            metrics.counter("interactions.dispatched").inc()
+            future.set_result(payload)
+
+    def _expire(self, message_id: int, future: asyncio.Future) -> None:
+        if not future.done():
+            metrics.counter("interactions.timeouts").inc()
+            future.set_exception(asyncio.TimeoutError())
+
+    def _remove(self, message_id: int, waiter: tuple) -> None:
+        if (timer := waiter[3]) is not None:
+            self.wheel.cancel(timer)
+
+        waiters = self._waiters.get(message_id, [])
+        if waiter in waiters:
+            waiters.remove(waiter)
+        if not waiters:
+            self._waiters.pop(message_id, None)
@@ -0,0 +1,138 @@
+# overseer.utils.metrics
+
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# Default histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """
+    Monotonically increasing count of something that happened.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int | float = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    """
+    Current level of something, such as the length of a queue.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: int | float) -> None:
+        self.value = value
+
+    def inc(self, amount: int | float = 1) -> None:
+        self.value += amount
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Observations are O(log buckets) and memory does
+    not grow with the number of observations.
+    """
+
+    def __init__(self, buckets: tuple[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Approximate a percentile by the upper bound of its bucket.
+        """
+        if not self.count:
+            return 0.0
+
+        rank, seen = percent / 100 * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max
+        }
+
+
+_counters: dict[str, Counter] = {}
+_gauges: dict[str, Gauge] = {}
+_histograms: dict[str, Histogram] = {}
+
+
+def counter(name: str) -> Counter:
+    if (metric := _counters.get(name)) is None:
+        metric = _counters[name] = Counter()
+
+    return metric
+
+
+def gauge(name: str) -> Gauge:
+    if (metric := _gauges.get(name)) is None:
+        metric = _gauges[name] = Gauge()
+
+    return metric
+
+
+def histogram(name: str, buckets: tuple[float] = LATENCY_BUCKETS) -> Histogram:
+    if (metric := _histograms.get(name)) is None:
+        metric = _histograms[name] = Histogram(buckets)
+
+    return metric
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """
+    Record how long the body of a `with` block takes in a histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram(name).observe(time.perf_counter() - start)
+
+
+def snapshot(prefix: str = "") -> dict[str, dict[str, float]]:
+    """
+    Current value of every counter and gauge and a summary of every
+    histogram whose name starts with `prefix`.
+    """
+    return {
+        "counters": {name: metric.value
+                     for name, metric in sorted(_counters.items())
+                     if name.startswith(prefix)},
+        "gauges": {name: metric.value
+                   for name, metric in sorted(_gauges.items())
+                   if name.startswith(prefix)},
+        "histograms": {name: metric.summary()
+                       for name, metric in sorted(_histograms.items())
+                       if name.startswith(prefix)}
+    }
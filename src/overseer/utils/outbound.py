@@ -0,0 +1,369 @@
+# overseer.utils.outbound
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable
+
+from utils import metrics
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+logger = logging.getLogger()
+
+# Priorities, lowest first. Replies to someone who is waiting go ahead of
+# bulk sends like notifications and spam.
+INTERACTIVE = 0
+BULK = 1
+
+# Discord's per-message embed limits, for batching.
+MAX_EMBEDS = 10
+MAX_EMBEDS_LENGTH = 6000
+
+# Rate limit state is kept for idle destinations, so the next send still
+# respects an exhausted bucket, until there are this many.
+MAX_IDLE_BUCKETS = 256
+
+# The destination whose queue is being drained by the current task, so that
+# the rate limit headers of discord.py's requests can be attributed to it.
+_destination: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "destination", default=None)
+
+
+class Job:
+    __slots__ = ("func", "future", "embeds", "retries")
+
+    def __init__(self, func: Callable[..., Awaitable], embeds: list | None):
+        self.func = func
+        self.future = asyncio.get_running_loop().create_future()
+        # Set for embed-only sends that can share a message with others.
+        self.embeds = embeds
+        self.retries = 0
+
+
+class SendScheduler:
+    """
+    Central queue for messages, reactions, and command replies.
+
+    Each destination gets its own priority queue, drained one request at a
+    time by a worker that only exists while the queue is non-empty. Pacing
+    follows the rate limit headers (`X-RateLimit-Remaining` and
+    `X-RateLimit-Reset-After`) of the responses to a destination's own
+    requests, read through `trace_config`, which must be passed to the bot
+    as `http_trace`. A worker waits out an exhausted bucket before it picks
+    its next job, so replies queued in the meantime go ahead of bulk sends.
+    Queued embed-only sends to the same destination are batched into one
+    message where Discord's limits allow.
+    """
+
+    def __init__(self, max_retries: int = 5, backoff: float = 1.0):
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self._ids = itertools.count()
+        self._queues: dict[str, list[tuple[int, int, Job]]] = {}
+        self._workers: dict[str, asyncio.Task] = {}
+        # Destination to (requests remaining, monotonic time of the reset).
+        self._buckets: dict[str, tuple[int, float]] = {}
+        self._resume_at: dict[str, float] = {}
+        self._global_resume_at = 0.0
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_end.append(self._on_request_end)
+
+    async def send(
+        self,
+        destination: discord.abc.Messageable,
+        content: str = None,
+        *,
+        priority: int = BULK,
+        batch: bool = False,
+        **kwargs
+    ) -> discord.Message:
+        """
+        Queue `destination.send(content, **kwargs)`. With `batch`, a send of
+        only `embed` may be merged with other queued embeds to the same
+        destination, and every merged send returns the same message.
+        """
+        embeds = None
+        if batch and content is None and set(kwargs) == {"embed"}:
+            embeds = [kwargs["embed"]]
+
+        # Contexts queue their own sends, so call past that here.
+        send = getattr(destination, "send_now", destination.send)
+
+        return await self.submit(
+            self._key(destination),
+            lambda **overrides: send(content, **(overrides or kwargs)),
+            priority,
+            embeds
+        )
+
+    async def add_reaction(
+        self,
+        message: discord.Message,
+        emoji: str,
+        *,
+        priority: int = INTERACTIVE
+    ) -> None:
+        # Reactions share a bucket per channel, separate from messages.
+        return await self.submit(
+            f"reactions:{message.channel.id}",
+            lambda: message.add_reaction(emoji),
+            priority
+        )
+
+    async def remove_reaction(
+        self,
+        message: discord.Message,
+        emoji: str | discord.PartialEmoji,
+        member: discord.abc.Snowflake,
+        *,
+        priority: int = INTERACTIVE
+    ) -> None:
+        return await self.submit(
+            f"reactions:{message.channel.id}",
+            lambda: message.remove_reaction(emoji, member),
+            priority
+        )
+
+    async def clear_reactions(
+        self,
+        message: discord.Message,
+        *,
+        priority: int = INTERACTIVE
+    ) -> None:
+        return await self.submit(
+            f"reactions:{message.channel.id}",
+            message.clear_reactions,
+            priority
+        )
+
+    async def edit(
+        self,
+        message: discord.Message | discord.PartialMessage,
+        *,
+        priority: int = BULK,
+        **kwargs
+    ) -> discord.Message:
+        """
+        Queue `message.edit(**kwargs)` behind the sends to its channel.
+        """
+        return await self.submit(
+            self._key(message),
+            lambda: message.edit(**kwargs),
+            priority
+        )
+
+    async def submit(
+        self,
+        key: str,
+        func: Callable[..., Awaitable],
+        priority: int = BULK,
+        embeds: list | None = None
+    ) -> Any:
+        job = Job(func, embeds)
+        heapq.heappush(self._queues.setdefault(key, []),
+                       (priority, next(self._ids), job))
+        metrics.gauge("outbound.queued").inc()
+
+        if key not in self._workers:
+            if len(self._buckets) > MAX_IDLE_BUCKETS:
+                self._prune()
+            self._workers[key] = asyncio.ensure_future(self._drain(key))
+
+        return await job.future
+
+    def depth(self, key: str = None) -> int:
+        if key is not None:
+            return len(self._queues.get(key, ()))
+
+        return sum(map(len, self._queues.values()))
+
+    async def close(self) -> None:
+        for worker in self._workers.values():
+            worker.cancel()
+        for queue in self._queues.values():
+            for _, _, job in queue:
+                job.future.cancel()
+
+        self._workers.clear()
+        self._queues.clear()
+        metrics.gauge("outbound.queued").set(0)
+
+    async def _drain(self, key: str) -> None:
+        _destination.set(key)
+        queue = self._queues[key]
+        try:
+            while queue:
+                # Wait before choosing, so the job is the most urgent one
+                # queued by the time the bucket has room.
+                await self._pace(key)
+                priority, _, job = heapq.heappop(queue)
+                jobs = [job]
+
+                # Fold queued embed-only sends of the same priority into one
+                # message, within the per-message limits.
+                if job.embeds is not None:
+                    embeds = list(job.embeds)
+                    length = sum(len(embed) for embed in embeds)
+                    while (queue and queue[0][0] == priority
+                           and (other := queue[0][2]).embeds is not None
+                           and len(embeds) + len(other.embeds) <= MAX_EMBEDS
+                           and length + sum(map(len, other.embeds))
+                           <= MAX_EMBEDS_LENGTH):
+                        heapq.heappop(queue)
+                        jobs.append(other)
+                        embeds += other.embeds
+                        length += sum(map(len, other.embeds))
+
+                metrics.gauge("outbound.queued").inc(-len(jobs))
+
+                try:
+                    if len(jobs) > 1:
+                        metrics.counter("outbound.batched").inc(len(jobs) - 1)
+                        result = await job.func(embeds=embeds)
+                    else:
+                        result = await job.func()
+                except (discord.RateLimited, discord.HTTPException) as e:
+                    if not self._retry(key, priority, jobs, e):
+                        for failed in jobs:
+                            if not failed.future.done():
+                                failed.future.set_exception(e)
+                except Exception as e:
+                    for failed in jobs:
+                        if not failed.future.done():
+                            failed.future.set_exception(e)
+                else:
+                    metrics.counter("outbound.sent").inc()
+                    for done in jobs:
+                        if not done.future.done():
+                            done.future.set_result(result)
+        finally:
+            self._workers.pop(key, None)
+            if not queue:
+                self._queues.pop(key, None)
+
+    def _retry(
+        self,
+        key: str,
+        priority: int,
+        jobs: list[Job],
+        error: Exception
+    ) -> bool:
+        """
+        Requeue jobs that discord.py gave up on because of a rate limit,
+        until they have been retried `max_retries` times.
+        """
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is None and getattr(error, "status", None) != 429:
+            return False
+        if jobs[0].retries >= self.max_retries:
+            return False
+
+        metrics.counter("outbound.retries").inc()
+        for job in jobs:
+            job.retries += 1
+            heapq.heappush(self._queues[key], (priority, next(self._ids), job))
+        metrics.gauge("outbound.queued").inc(len(jobs))
+
+        # Hold this destination back for as long as Discord asked, or back
+        # off exponentially if it didn't say.
+        if retry_after is None:
+            retry_after = self.backoff * 2 ** (jobs[0].retries - 1)
+        self._resume_at[key] = max(self._resume_at.get(key, 0.0),
+                                   time.monotonic() + retry_after)
+
+        return True
+
+    async def _pace(self, key: str) -> None:
+        resume_at = max(self._global_resume_at,
+                        self._resume_at.pop(key, 0.0))
+
+        remaining, reset_at = self._buckets.get(key, (1, 0.0))
+        if remaining <= 0:
+            resume_at = max(resume_at, reset_at)
+
+        if (delay := resume_at - time.monotonic()) > 0:
+            metrics.counter("outbound.delayed").inc()
+            await asyncio.sleep(delay)
+
+    async def _on_request_end(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams
+    ) -> None:
+        """
+        Record the rate limit headers of a response to one of discord.py's
+        requests. Only requests made by a worker are attributed to its
+        destination, and a DM's lookup of its channel is followed by the
+        send itself, so the last response seen is the one that counts.
+        """
+        headers = params.response.headers
+
+        if params.response.status == 429:
+            metrics.counter("outbound.rate_limited").inc()
+            if headers.get("X-RateLimit-Global") == "true":
+                metrics.counter("outbound.rate_limited_global").inc()
+                self._global_resume_at = time.monotonic() + float(
+                    headers.get("Retry-After", 1.0))
+
+        if (key := _destination.get()) is None:
+            return
+        if "X-RateLimit-Remaining" not in headers:
+            return
+
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_after = float(headers.get("X-RateLimit-Reset-After", 0.0))
+        except ValueError:
+            return
+
+        self._buckets[key] = (remaining, time.monotonic() + reset_after)
+
+    def _prune(self) -> None:
+        """
+        Forget the rate limit state of idle destinations whose buckets have
+        since reset.
+        """
+        now = time.monotonic()
+        for key in [key for key, (_, reset_at) in self._buckets.items()
+                    if key not in self._workers and reset_at < now]:
+            del self._buckets[key]
+            self._resume_at.pop(key, None)
+
+    @staticmethod
+    def _key(destination: discord.abc.Messageable) -> str:
+        # Contexts send to their channel; users and members to their DMs.
+        if isinstance(destination, discord.abc.User):
+            return f"user:{destination.id}"
+
+        channel = getattr(destination, "channel", destination)
+        return f"channel:{channel.id}"
+
+
+class OutboundContext(commands.Context):
+    """
+    Command context whose replies are queued on the bot's `outbound`
+    scheduler, ahead of bulk sends to the same channel.
+    """
+
+    async def send(
+        self,
+        content: str = None,
+        *,
+        priority: int = INTERACTIVE,
+        **kwargs
+    ) -> discord.Message:
+        return await self.bot.outbound.send(
+            self, content, priority=priority, **kwargs)
+
+    async def send_now(self, content: str = None, **kwargs) -> discord.Message:
+        return await super().send(content, **kwargs)
@@ -1,41 +1,139 @@
 # overseer.utils.parsers
 
+import collections
 import re
+from typing import Iterable
 
 from discord import Guild
 from discord.ext.commands import Bot
 
 
+# Matches user (<@id>, <@!id>), role (<@&id>), and channel (<#id>) mentions.
+MENTION_PATTERN = re.compile(r"<(@[!&]?|#)(\d+)>")
+MENTION_KINDS = {"@": "user", "@!": "user", "@&": "role", "#": "channel"}
+
+
+class MentionCache:
+    """
+    Bounded LRU of mention ID to display name, kept separately per guild so
+    one busy guild can't evict every other guild's entries. Entries are
+    invalidated from update events rather than expiring.
+    """
+
+    def __init__(self, max_guilds: int = 1000, max_entries: int = 1000):
+        self.max_guilds = max_guilds
+        self.max_entries = max_entries
+        self._guilds: collections.OrderedDict[
+            int | None, collections.OrderedDict[tuple[str, int], str]
+        ] = collections.OrderedDict()
+
+    def get(self, guild_id: int | None, key: tuple[str, int]) -> str | None:
+        if (entries := self._guilds.get(guild_id)) is None:
+            return None
+
+        self._guilds.move_to_end(guild_id)
+        if (name := entries.get(key)) is not None:
+            entries.move_to_end(key)
+
+        return name
+
+    def set(self, guild_id: int | None, key: tuple[str, int], name: str) -> None:
+        if (entries := self._guilds.get(guild_id)) is None:
+            entries = self._guilds[guild_id] = collections.OrderedDict()
+            if len(self._guilds) > self.max_guilds:
+                self._guilds.popitem(last=False)
+
+        entries[key] = name
+        entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def invalidate(self, key: tuple[str, int], guild_id: int = None) -> None:
+        """
+        Drop an entry from one guild, or from every guild if no guild is
+        given (users and channels are cached per guild but IDs are global).
+        """
+        guilds = (self._guilds.values() if guild_id is None
+                  else [self._guilds.get(guild_id, {})])
+        for entries in guilds:
+            entries.pop(key, None)
+
+    def invalidate_guild(self, guild_id: int) -> None:
+        self._guilds.pop(guild_id, None)
+
+    def clear(self) -> None:
+        self._guilds.clear()
+
+
+mention_cache = MentionCache()
+
+
+def invalidate_user(user_id: int) -> None:
+    mention_cache.invalidate(("user", user_id))
+
+
+def invalidate_role(guild_id: int, role_id: int) -> None:
+    mention_cache.invalidate(("role", role_id), guild_id)
+
+
+def invalidate_channel(channel_id: int) -> None:
+    mention_cache.invalidate(("channel", channel_id))
+
+
+def invalidate_guild(guild_id: int) -> None:
+    mention_cache.invalidate_guild(guild_id)
+
+
+def _resolve(bot: Bot, guild: Guild | None, kind: str, id: int) -> str | None:
+    guild_id = guild.id if guild else None
+    if (name := mention_cache.get(guild_id, (kind, id))) is not None:
+        return name
+
+    if kind == "user":
+        obj_from_id = bot.get_user(id)
+    elif kind == "role":
+        obj_from_id = guild.get_role(id) if guild else None
+    else:
+        obj_from_id = bot.get_channel(id)
+
+    # Don't cache misses; the object may become visible later.
+    if not obj_from_id:
+        return None
+
+    mention_cache.set(guild_id, (kind, id), obj_from_id.name)
+    return obj_from_id.name
+
+
 def parse_mentions(message: str, bot: Bot, guild: Guild = None) -> str:
-    new_message, start_index = '', 0
-
-    for match in re.finditer(r"<[@#][!&]?\d*>", message):
-        # Slice message at start and end indices of the match.
-        end_index, new_start_index = match.span()
-        new_message += message[start_index:end_index]
-
-        # Extract user, role, or channel ID from match.
-        id = match[0].replace("<", "").replace(">", "")
-
-        if id[0] == "@":
-            if id[1] == "!":  # Nickname
-                obj_from_id = bot.get_user(int(id[2:]))
-            elif id[1] == "&":  # Role
-                obj_from_id = (guild.get_role(int(id[2:]))
-                               if guild else None)
-            else:  # Regular username
-                obj_from_id = bot.get_user(int(id[1:]))
-        elif id[0] == "#":  # Channel
-            obj_from_id = bot.get_channel(int(id[1:]))
-        else:
-            continue
-
-        # If ID couldn't be converted, don't replace matched string.
-        if not obj_from_id:
-            continue
-
-        # Update message string and start index.
-        new_message += obj_from_id.name
-        start_index = new_start_index
-
-    return new_message + message[start_index:]
+    """
+    Replace user, role, and channel mentions with their names in a single
+    pass. Mentions that can't be resolved are left as they are.
+    """
+    def replace(match: re.Match) -> str:
+        prefix, id = match.groups()
+        return _resolve(bot, guild, MENTION_KINDS[prefix], int(id)) or match[0]
+
+    return MENTION_PATTERN.sub(replace, message)
+
+
+def parse_mentions_batch(
+    messages: Iterable[str],
+    bot: Bot,
+    guild: Guild = None
+) -> list[str]:
+    """
+    Resolve mentions in many messages from the same guild. Each distinct
+    mention is looked up at most once for the whole batch.
+    """
+    resolved = {}
+
+    def replace(match: re.Match) -> str:
+        if (name := resolved.get(match[0])) is None:
+            prefix, id = match.groups()
+            name = resolved[match[0]] = (
+                _resolve(bot, guild, MENTION_KINDS[prefix], int(id))
+                or match[0])
+
+        return name
+
+    return [MENTION_PATTERN.sub(replace, message) for message in messages]
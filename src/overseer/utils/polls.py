@@ -0,0 +1,303 @@
+# overseer.utils.polls
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+from typing import Callable
+
+from utils import metrics
+
+import discord
+from discord.ext import commands
+
+logger = logging.getLogger()
+
+# Reactions members vote with, in display order.
+POLL_OPTIONS = {"👍": "Yes", "👎": "No", "🤷": "Maybe"}
+
+
+class Poll:
+    """
+    Live tally of a poll. Each member gets one vote: the most recent option
+    they reacted with that they haven't since removed. Counts are updated
+    incrementally as reactions come in, so reading them is O(options).
+    """
+
+    def __init__(
+        self,
+        message_id: int,
+        channel_id: int,
+        title: str,
+        author_id: int,
+        author: str,
+        reactions: dict[int, list[str]] | None = None
+    ):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.title = title
+        self.author_id = author_id
+        self.author = author
+
+        # User ID to the options they've reacted with, oldest first.
+        self.reactions = reactions or {}
+        self.counts = dict.fromkeys(POLL_OPTIONS, 0)
+        for options in self.reactions.values():
+            self.counts[options[-1]] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def vote(self, user_id: int, option: str) -> bool:
+        if option not in POLL_OPTIONS:
+            return False
+
+        options = self.reactions.setdefault(user_id, [])
+        if option in options:
+            return False
+
+        if options:
+            self.counts[options[-1]] -= 1
+        options.append(option)
+        self.counts[option] += 1
+
+        return True
+
+    def unvote(self, user_id: int, option: str) -> bool:
+        options = self.reactions.get(user_id, [])
+        if option not in options:
+            return False
+
+        self.counts[options[-1]] -= 1
+        options.remove(option)
+        if options:
+            self.counts[options[-1]] += 1
+        else:
+            del self.reactions[user_id]
+
+        return True
+
+    def to_json(self) -> dict:
+        return {
+            "channel_id": self.channel_id,
+            "title": self.title,
+            "author_id": self.author_id,
+            "author": self.author,
+            "reactions": self.reactions
+        }
+
+    @classmethod
+    def from_json(cls, message_id: int, data: dict) -> "Poll":
+        return cls(
+            message_id,
+            data["channel_id"],
+            data["title"],
+            data["author_id"],
+            data["author"],
+            {int(user_id): options
+             for user_id, options in data["reactions"].items()}
+        )
+
+
+class PollTracker:
+    """
+    Tracks open polls from raw reaction events routed by `bot.interactions`,
+    so results never need the message's reactions to be fetched. Poll
+    messages are edited at most once per `debounce` seconds with the live
+    results, and open polls are snapshotted to `path` so they survive
+    restarts (votes cast while the bot is down are not counted). Polls that
+    are still open `max_age` seconds after they were created are dropped.
+    """
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        render: Callable[[Poll], discord.Embed],
+        path: str = "lists/polls.json",
+        debounce: float = 5.0,
+        snapshot_interval: float = 60.0,
+        max_age: float = 2592000.0
+    ):
+        self.bot = bot
+        self.render = render
+        self.path = path
+        self.debounce = debounce
+        self.snapshot_interval = snapshot_interval
+        self.max_age = datetime.timedelta(seconds=max_age)
+
+        self.polls: dict[int, Poll] = {}
+        self._edits: dict[int, asyncio.Task] = {}
+        self._dirty = False
+        self._task = None
+
+    def track(self, poll: Poll) -> None:
+        self.polls[poll.message_id] = poll
+        self.bot.interactions.add_handler(
+            poll.message_id,
+            lambda event, payload: self._handle(poll, event, payload))
+        self._dirty = True
+
+    async def close_poll(self, message_id: int) -> Poll | None:
+        """
+        Stop tracking a poll and return its final results.
+        """
+        if (poll := self.polls.pop(message_id, None)) is None:
+            return None
+
+        self.bot.interactions.remove_handler(message_id)
+        if (edit := self._edits.pop(message_id, None)) is not None:
+            edit.cancel()
+        self._dirty = True
+
+        return poll
+
+    def latest(self, channel_id: int) -> Poll | None:
+        """
+        The most recently created open poll in a channel.
+        """
+        polls = [poll for poll in self.polls.values()
+                 if poll.channel_id == channel_id]
+        return max(polls, key=lambda poll: poll.message_id, default=None)
+
+    async def expire(self) -> None:
+        """
+        Stop tracking polls older than `max_age`, which nobody is going to
+        close anymore.
+        """
+        for message_id in [message_id for message_id in self.polls
+                           if self._expired(message_id)]:
+            await self.close_poll(message_id)
+            metrics.counter("polls.expired").inc()
+
+    def _expired(self, message_id: int) -> bool:
+        # A message ID holds the time the message was sent.
+        created = discord.utils.snowflake_time(message_id)
+        return discord.utils.utcnow() - created > self.max_age
+
+    def start(self) -> None:
+        self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._snapshot())
+
+    async def close(self) -> None:
+        for task in (self._task, *self._edits.values()):
+            if task is not None:
+                task.cancel()
+        self._task = None
+        self._edits.clear()
+
+        for message_id in self.polls:
+            self.bot.interactions.remove_handler(message_id)
+
+        if self._dirty:
+            self.save()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as file:
+                polls = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(
+                "Failed to load polls from %s (%s): %s",
+                self.path,
+                type(e).__name__,
+                str(e)
+            )
+            return
+
+        expired = False
+        for message_id, data in polls.items():
+            if self._expired(int(message_id)):
+                expired = True
+            else:
+                self.track(Poll.from_json(int(message_id), data))
+        self._dirty = expired
+
+    def save(self) -> None:
+        self._write(self._serialize())
+
+    def _serialize(self) -> str:
+        self._dirty = False
+
+        return json.dumps(
+            {message_id: poll.to_json()
+             for message_id, poll in self.polls.items()},
+            separators=(",", ":"))
+
+    def _write(self, data: str) -> None:
+        # Write to a temporary file first so a crash can't truncate the store.
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(data)
+        os.replace(temp_path, self.path)
+
+    def _handle(
+        self,
+        poll: Poll,
+        event: str,
+        payload: discord.RawReactionActionEvent
+    ) -> None:
+        if self.bot.user and payload.user_id == self.bot.user.id:
+            return
+
+        option = str(payload.emoji)
+        if event == "reaction_add":
+            changed = poll.vote(payload.user_id, option)
+        else:
+            changed = poll.unvote(payload.user_id, option)
+
+        if not changed:
+            return
+
+        metrics.counter("polls.votes").inc()
+        self._dirty = True
+        if poll.message_id not in self._edits:
+            self._edits[poll.message_id] = asyncio.ensure_future(
+                self._edit(poll))
+
+    async def _edit(self, poll: Poll) -> None:
+        # Collect every vote in the debounce window into a single edit.
+        await asyncio.sleep(self.debounce)
+        self._edits.pop(poll.message_id, None)
+
+        if not (channel := self.bot.get_channel(poll.channel_id)):
+            return
+
+        try:
+            await self.bot.outbound.edit(
+                channel.get_partial_message(poll.message_id),
+                embed=self.render(poll))
+            metrics.counter("polls.edits").inc()
+        except discord.NotFound:
+            await self.close_poll(poll.message_id)
+        except discord.HTTPException as e:
+            logger.warning(
+                "Failed to update poll %s (%s): %s",
+                poll.message_id,
+                type(e).__name__,
+                str(e)
+            )
+
+    async def _snapshot(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.expire()
+            if not self._dirty:
+                continue
+
+            # Serialize on the event loop so votes can't change mid-dump.
+            data = self._serialize()
+            try:
+                await asyncio.to_thread(self._write, data)
+            except OSError as e:
+                self._dirty = True
+                logger.error(
+                    "Failed to save polls to %s (%s): %s",
+                    self.path,
+                    type(e).__name__,
+                    str(e)
+                )
@@ -0,0 +1,389 @@
+# overseer.utils.transforms
+
+import abc
+import functools
+import hashlib
+import itertools
+import random
+import string
+from typing import Callable, NamedTuple
+
+from discord.ext import commands
+
+
+# Lowercase vowels that b-ify prepends to instead of replacing.
+VOWELS = frozenset("aeiou")
+
+# Every combination of leetspeak substitutions, compiled once. A message is
+# translated with one randomly chosen table, so each letter is replaced
+# consistently throughout it.
+_LEET_CHOICES = {
+    "a": ("4", "@"),
+    "c": ("(", "<"),
+    "e": ("3",),
+    "l": ("1", "|"),
+    "o": ("0", "()"),
+    "s": ("5", "$", "z"),
+    "t": ("7", "+"),
+}
+LEET_TABLES = tuple(
+    str.maketrans(dict(zip(_LEET_CHOICES, choice)))
+    for choice in itertools.product(*_LEET_CHOICES.values())
+)
+
+# Caesar cipher tables for every distance in the alphabet.
+CIPHER_TABLES = tuple(
+    str.maketrans(
+        string.ascii_lowercase + string.ascii_uppercase,
+        (string.ascii_lowercase[shift:] + string.ascii_lowercase[:shift]
+         + string.ascii_uppercase[shift:] + string.ascii_uppercase[:shift])
+    )
+    for shift in range(26)
+)
+
+HASH_ALGORITHMS = ("md5", "sha1", "sha224", "sha256", "sha384", "sha512",
+                   "blake2b", "blake2s")
+
+
+# Streamed input is held back at most this many characters while waiting
+# for the end of a word, and buffering transforms accept at most this many.
+MAX_CARRY = 64 * 1024
+MAX_BUFFERED = 1024 * 1024
+
+
+def bify_word(word: str, letter_emoji: str = ":b:") -> str:
+    return (f"{letter_emoji}{word}" if word[0] in VOWELS
+            else f"{letter_emoji}{word[1:]}")
+
+
+def bify(message: str, letter_emoji: str = ":b:") -> str:
+    return " ".join(bify_word(word, letter_emoji) for word in message.split())
+
+
+def letter_emoji(letter: str = None) -> str:
+    return f":regional_indicator_{letter.lower()}:" if letter else ":b:"
+
+
+def cipher(message: str, distance: int = 13) -> str:
+    return message.translate(CIPHER_TABLES[distance % 26])
+
+
+def clap(message: str) -> str:
+    return " :clap: ".join(message.split())
+
+
+def expand(message: str) -> str:
+    return " ".join(message)
+
+
+def leetspeak(message: str) -> str:
+    return message.lower().strip().translate(random.choice(LEET_TABLES))
+
+
+def mock(message: str) -> str:
+    characters = list(message.lower().strip())
+    characters[1::2] = map(str.upper, characters[1::2])
+
+    return "".join(characters)
+
+
+def reverse(message: str) -> str:
+    return message[::-1]
+
+
+def checksum(message: str, algorithm: str = "md5") -> str:
+    return hashlib.new(algorithm, message.encode()).hexdigest()
+
+
+class MultiHash:
+    """
+    Computes several digests of the same data in a single pass over it.
+    """
+
+    def __init__(self, algorithms: tuple[str]):
+        self.hashes = {algorithm: hashlib.new(algorithm)
+                       for algorithm in algorithms}
+
+    def update(self, data: bytes) -> None:
+        for hash in self.hashes.values():
+            hash.update(data)
+
+    def hexdigests(self) -> dict[str, str]:
+        return {algorithm: hash.hexdigest()
+                for algorithm, hash in self.hashes.items()}
+
+
+class TextStream(abc.ABC):
+    """
+    Applies a transform to text that arrives in chunks. `feed` returns the
+    output that is ready so far and `flush` returns whatever is left once
+    the input has ended.
+    """
+
+    @abc.abstractmethod
+    def feed(self, text: str) -> str:
+        pass
+
+    def flush(self) -> str:
+        return ""
+
+
+class ChunkStream(TextStream):
+    """
+    Transforms where every character is handled independently.
+    """
+
+    def __init__(self, func: Callable[[str], str]):
+        self.func = func
+
+    def feed(self, text: str) -> str:
+        return self.func(text)
+
+
+class WordStream(TextStream):
+    """
+    Transforms that split on whitespace and rejoin words with a separator.
+    A word that may continue into the next chunk is held back.
+    """
+
+    def __init__(self, func: Callable[[str], str], separator: str = " "):
+        self.func = func
+        self.separator = separator
+        self._carry = ""
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        text = self._carry + text
+        words = text.split()
+
+        if words and not text[-1].isspace() and len(words[-1]) <= MAX_CARRY:
+            self._carry = words.pop()
+        else:
+            self._carry = ""
+
+        return self._emit(words)
+
+    def flush(self) -> str:
+        words, self._carry = self._carry.split(), ""
+        return self._emit(words)
+
+    def _emit(self, words: list[str]) -> str:
+        if not words:
+            return ""
+
+        output = self.separator.join(map(self.func, words))
+        if self._started:
+            output = self.separator + output
+        self._started = True
+
+        return output
+
+
+class ExpandStream(TextStream):
+    def __init__(self):
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        if not text:
+            return ""
+
+        output = (" " if self._started else "") + expand(text)
+        self._started = True
+
+        return output
+
+
+class MockStream(TextStream):
+    """
+    Alternates case across chunk boundaries by tracking the offset.
+    """
+
+    def __init__(self):
+        self._offset = 0
+
+    def feed(self, text: str) -> str:
+        characters = list(text.lower())
+        start = 1 - self._offset % 2
+        characters[start::2] = map(str.upper, characters[start::2])
+        self._offset += len(characters)
+
+        return "".join(characters)
+
+
+class HashStream(TextStream):
+    def __init__(self, algorithm: str):
+        self.hash = hashlib.new(algorithm)
+
+    def feed(self, text: str) -> str:
+        self.hash.update(text.encode())
+        return ""
+
+    def flush(self) -> str:
+        return self.hash.hexdigest()
+
+
+class BufferedStream(TextStream):
+    """
+    Transforms that need all of their input at once, up to `MAX_BUFFERED`
+    characters.
+    """
+
+    def __init__(self, func: Callable[[str], str]):
+        self.func = func
+        self._chunks, self._length = [], 0
+
+    def feed(self, text: str) -> str:
+        self._length += len(text)
+        if self._length > MAX_BUFFERED:
+            raise ValueError(
+                f"input is too large (over {MAX_BUFFERED} characters)")
+
+        self._chunks.append(text)
+        return ""
+
+    def flush(self) -> str:
+        text, self._chunks = "".join(self._chunks), []
+        return self.func(text)
+
+
+class PipelineStream(TextStream):
+    def __init__(self, streams: list[TextStream]):
+        self.streams = streams
+
+    def feed(self, text: str) -> str:
+        for stream in self.streams:
+            text = stream.feed(text)
+
+        return text
+
+    def flush(self) -> str:
+        # Each stage's leftovers still have to pass through later stages.
+        text = ""
+        for stream in self.streams:
+            text = stream.feed(text) + stream.flush()
+
+        return text
+
+
+def _leetspeak_stream() -> TextStream:
+    # Pick one table so the whole stream is translated consistently.
+    table = random.choice(LEET_TABLES)
+    return ChunkStream(lambda text: text.lower().translate(table))
+
+
+class Transform(NamedTuple):
+    """
+    A text transform usable in a pipeline. `argument` is the type of its
+    optional `name:argument` parameter, `resolve_mentions` marks transforms
+    that should see display names rather than raw mentions, and `stream`
+    builds a `TextStream` that applies the transform to chunked input.
+    """
+    func: Callable[..., str]
+    stream: Callable[..., TextStream]
+    argument: type | None = None
+    resolve_mentions: bool = False
+
+
+TRANSFORMS = {
+    "bify": Transform(
+        lambda message, letter=None: bify(message, letter_emoji(letter)),
+        lambda letter=None: WordStream(functools.partial(
+            bify_word, letter_emoji=letter_emoji(letter))),
+        str,
+        True
+    ),
+    "cipher": Transform(
+        cipher,
+        lambda distance=13: ChunkStream(
+            functools.partial(cipher, distance=distance)),
+        int
+    ),
+    "clap": Transform(clap, lambda: WordStream(str, " :clap: ")),
+    "expand": Transform(expand, ExpandStream),
+    "leetspeak": Transform(leetspeak, _leetspeak_stream),
+    "mock": Transform(mock, MockStream),
+    "reverse": Transform(
+        reverse,
+        lambda: BufferedStream(reverse),
+        resolve_mentions=True
+    ),
+    **{algorithm: Transform(
+        functools.partial(checksum, algorithm=algorithm),
+        functools.partial(HashStream, algorithm),
+        resolve_mentions=True
+    ) for algorithm in HASH_ALGORITHMS}
+}
+
+
+def _apply(func: Callable[..., str], message: str, argument) -> str:
+    return func(message, argument)
+
+
+class Pipeline(NamedTuple):
+    stages: tuple[Callable[[str], str]]
+    streams: tuple[Callable[[], TextStream]]
+    resolve_mentions: bool
+
+    def __call__(self, message: str) -> str:
+        for stage in self.stages:
+            message = stage(message)
+
+        return message
+
+    def stream(self) -> TextStream:
+        """
+        A fresh stream that applies the whole pipeline to chunked input.
+        """
+        return PipelineStream([stream() for stream in self.streams])
+
+
+@functools.lru_cache(maxsize=128)
+def compile_pipeline(spec: str) -> Pipeline:
+    """
+    Compile a pipeline such as `mock|clap|cipher:3` into a single callable.
+    Raises `ValueError` for unknown transforms or bad arguments.
+    """
+    stages, streams, resolve_mentions = [], [], False
+
+    for stage in spec.lower().split("|"):
+        name, _, argument = stage.strip().partition(":")
+        if (transform := TRANSFORMS.get(name)) is None:
+            raise ValueError(f'"{name}" is not a transform')
+
+        if argument:
+            if transform.argument is None:
+                raise ValueError(f'"{name}" does not take an argument')
+            if transform.argument is str and not (
+                    len(argument) == 1 and argument.isalpha()):
+                raise ValueError(f'"{name}" takes a single letter')
+
+            try:
+                argument = transform.argument(argument)
+            except ValueError:
+                raise ValueError(
+                    f'"{argument}" is not a valid argument for "{name}"')
+
+            stages.append(functools.partial(
+                _apply, transform.func, argument=argument))
+            streams.append(functools.partial(transform.stream, argument))
+        else:
+            stages.append(transform.func)
+            streams.append(transform.stream)
+
+        resolve_mentions |= transform.resolve_mentions
+
+    return Pipeline(tuple(stages), tuple(streams), resolve_mentions)
+
+
+class PipelineConverter(commands.Converter):
+    """
+    Command argument converter for transform pipelines.
+    """
+
+    async def convert(self, context: commands.Context, argument: str) -> Pipeline:
+        try:
+            return compile_pipeline(argument)
+        except ValueError as e:
+            raise commands.BadArgument(
+                f"{e}. Valid transforms are: "
+                + ", ".join(f'"{name}"' for name in TRANSFORMS))
@@ -0,0 +1,31 @@
+# tests.conftest
+
+# Tests import the Overseer the same way the bot runs, from src/overseer,
+# with its configs read from a scratch directory instead of ~/overseer.
+
+import os
+import sys
+import tempfile
+
+import yaml
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "src", "overseer"))
+
+from utils import configs  # noqa: E402
+
+COLORS = {
+    "black": 0x000000,
+    "green": 0x00ff00,
+    "orange": 0xffa500,
+    "purple": 0x800080,
+    "red": 0xff0000,
+    "yellow": 0xffff00,
+}
+
+# Cogs load their configs when they're imported, so this has to be set up
+# before any test module imports one.
+configs.CONFIG_DIR = tempfile.mkdtemp(prefix="overseer-config-")
+with open(os.path.join(configs.CONFIG_DIR, "colors.yaml"), "w") as file:
+    yaml.safe_dump(COLORS, file)
@@ -0,0 +1,29 @@
+# tests.test_cache
+
+import asyncio
+
+from utils.cache import TTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache("test_lru", ttl=60, max_size=2)
+    loads = []
+
+    def loader(key):
+        async def load():
+            loads.append(key)
+            return key
+
+        return load
+
+    async def main():
+        await cache.get("a", loader("a"))
+        await cache.get("b", loader("b"))
+        # Using "a" again makes "b" the least recently used.
+        await cache.get("a", loader("a"))
+        await cache.get("c", loader("c"))
+        await cache.get("a", loader("a"))
+        await cache.get("b", loader("b"))
+
+    asyncio.run(main())
+    assert loads == ["a", "b", "c", "b"]
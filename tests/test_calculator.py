@@ -0,0 +1,49 @@
+# tests.test_calculator
+
+import pytest
+
+from utils.calculator import MAX_EXPONENT, calculate
+from utils.custom_exceptions import CalculationError
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("1 + 2 * 3", 7),
+    ("round(2.567, 2)", 2.57),
+    ("round(123456, -2)", 123500),
+    ("gcd(12, 18)", 6),
+    ("max(1, 5, 3)", 5),
+    ("min(1, 5, 3)", 1),
+    ("hypot(3, 4)", 5.0),
+])
+def test_whitelisted_functions(expression, expected):
+    assert calculate(expression) == expected
+
+
+# Each of these used to run for as long as it took to build a number with
+# about as many digits as the argument, which is effectively forever.
+@pytest.mark.parametrize("expression", [
+    "round(1, -(10 ** 1000))",
+    "round(1, 10 ** 1000)",
+    "round(1.5, -(10 ** 1000))",
+    f"round(1, -{MAX_EXPONENT + 1})",
+])
+def test_round_digits_are_bounded(expression):
+    with pytest.raises(CalculationError):
+        calculate(expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "gcd(2 ** 4096, 3)",
+    "hypot(2 ** 4096, 1)",
+    "max(2 ** 4096, 1)",
+    "min(-(2 ** 4096), 1)",
+    "abs(-(2 ** 4096))",
+])
+def test_function_arguments_are_bounded(expression):
+    with pytest.raises(CalculationError):
+        calculate(expression)
+
+
+def test_power_is_bounded():
+    with pytest.raises(CalculationError):
+        calculate("9 ** 9 ** 9")
@@ -0,0 +1,162 @@
+# tests.test_calendars
+
+import asyncio
+import datetime
+import zoneinfo
+
+import pytest
+from dateutil import rrule
+
+from utils.calendars import CalendarIndex, NotificationLedger, NotificationScheduler
+
+UTC = datetime.timezone.utc
+
+
+def write_calendar(path, events) -> None:
+    """
+    Write a calendar of (uid, start, description) events to `path`.
+    """
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//overseer//tests//EN"]
+    for uid, start, description in events:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{uid}",
+            f"SUMMARY:{uid}",
+            f"DTSTART:{start:%Y%m%dT%H%M%SZ}",
+            f"DESCRIPTION:{description}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+
+    path.write_text("\r\n".join(lines))
+
+
+class FailingLedger(NotificationLedger):
+    """
+    Ledger whose first flush fails, as a full disk would.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.failures = 1
+
+    async def flush(self) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("disk full")
+        await super().flush()
+
+
+def test_scheduler_rearms_after_a_failed_tick(tmp_path):
+    calendar = tmp_path / "calendar.ics"
+    now = datetime.datetime.now(UTC).replace(microsecond=0)
+    write_calendar(calendar, [
+        ("first", now + datetime.timedelta(seconds=1),
+         "CHANNELS: 1\\nLEAD: 0"),
+        ("second", now + datetime.timedelta(seconds=2),
+         "CHANNELS: 1\\nLEAD: 0"),
+    ])
+    notified = []
+
+    async def notify(event, target, now):
+        notified.append(event.uid)
+
+    async def main():
+        scheduler = NotificationScheduler(
+            CalendarIndex(str(calendar)), notify,
+            FailingLedger(str(tmp_path / "notifications.json")))
+        scheduler.start()
+        try:
+            await asyncio.sleep(2.5)
+        finally:
+            await scheduler.close()
+
+    asyncio.run(main())
+    assert notified == ["first", "second"]
+
+
+def recurring_calendar(path, rule: str, dtstart: str = "20200101T093000") -> None:
+    path.write_text("\r\n".join([
+        "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//overseer//tests//EN",
+        "BEGIN:VEVENT",
+        "UID:recurring",
+        "SUMMARY:recurring",
+        f"DTSTART;TZID=America/New_York:{dtstart}",
+        f"RRULE:{rule}",
+        "EXDATE;TZID=America/New_York:20261104T093000",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]))
+
+
+@pytest.mark.parametrize("rule", [
+    "FREQ=DAILY",
+    "FREQ=DAILY;INTERVAL=3",
+    "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR",
+    "FREQ=WEEKLY;INTERVAL=3;WKST=SU;BYDAY=SU,SA",
+    "FREQ=HOURLY;INTERVAL=7;BYHOUR=9,10,11,12,13,14,15,16",
+    "FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=1",
+    "FREQ=DAILY;COUNT=3000",
+    "FREQ=DAILY;UNTIL=20261105T000000Z",
+    "FREQ=MONTHLY;BYDAY=-1FR",
+])
+def test_recurrences_match_a_full_expansion(tmp_path, rule):
+    calendar = tmp_path / "calendar.ics"
+    recurring_calendar(calendar, rule)
+    index = CalendarIndex(str(calendar))
+    index.refresh()
+    recurrence = index.recurring[0]
+
+    # Expanded from DTSTART, as the rule is defined.
+    tz = zoneinfo.ZoneInfo("America/New_York")
+    full = rrule.rruleset()
+    # The reference is expanded in wall time, like the index, so UNTIL is too.
+    full.rrule(rrule.rrulestr(
+        rule.replace("20261105T000000Z", "20261104T190000"),
+        dtstart=datetime.datetime(2020, 1, 1, 9, 30)))
+    full.exdate(datetime.datetime(2026, 11, 4, 9, 30))
+
+    start = datetime.datetime(2026, 10, 29, 13, tzinfo=UTC)
+    for days in (0, 1, 5, 40, 3, 400):
+        query = start + datetime.timedelta(days=days)
+        end = query + datetime.timedelta(days=20)
+        expected = [
+            wall.replace(tzinfo=tz)
+            for wall in full.between(
+                query.astimezone(tz).replace(tzinfo=None)
+                - datetime.timedelta(days=1),
+                end.astimezone(tz).replace(tzinfo=None), inc=True)
+            if query <= wall.replace(tzinfo=tz) < end
+        ]
+        assert [event.start for event in recurrence.between(query, end)] \
+            == expected
+        assert [event.start for event in index.between(query, end, limit=5)] \
+            == expected[:5]
+
+
+def test_events_without_channels_go_to_the_default_channel(tmp_path):
+    calendar = tmp_path / "calendar.ics"
+    now = datetime.datetime.now(UTC).replace(microsecond=0)
+    write_calendar(calendar, [
+        ("listed", now + datetime.timedelta(seconds=1),
+         "CHANNELS: 1\\nLEAD: 0"),
+        ("unlisted", now + datetime.timedelta(seconds=1), "LEAD: 0"),
+    ])
+    notified = []
+
+    async def notify(event, target, now):
+        notified.append((event.uid, target))
+
+    async def main():
+        scheduler = NotificationScheduler(
+            CalendarIndex(str(calendar)), notify,
+            NotificationLedger(str(tmp_path / "notifications.json")),
+            default_channel=2)
+        scheduler.start()
+        try:
+            await asyncio.sleep(1.5)
+        finally:
+            await scheduler.close()
+
+    asyncio.run(main())
+    assert sorted(notified) == [("listed", "channel:1"), ("unlisted", "channel:2")]
@@ -0,0 +1,42 @@
+# tests.test_chunking
+
+from utils.chunking import chunk_messages, chunk_text
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("hello", 10) == ["hello"]
+
+
+def test_newline_in_back_half_is_preferred():
+    text = "a" * 8 + "\n" + "b b"
+    assert chunk_text(text, 10) == ["a" * 8, "b b"]
+
+
+def test_newline_near_window_start_is_ignored():
+    text = "a\n" + "b" * 5 + " " + "c" * 5
+    assert chunk_text(text, 10) == ["a\n" + "b" * 5, "c" * 5]
+
+
+def test_long_word_is_hard_cut():
+    assert chunk_text("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_blank_chunks_are_dropped():
+    text = "a" * 10 + "\n" * 30 + "b"
+    assert all(chunk.strip() for chunk in chunk_text(text, 10))
+    assert chunk_text("   \n  ", 10) == []
+
+
+def test_chunks_stay_within_limit():
+    text = ("word " * 7 + "\n") * 500
+    assert all(len(chunk) <= 100 for chunk in chunk_text(text, 100))
+
+
+def test_several_embeds_fill_each_message():
+    text = "x" * 12000
+    messages = chunk_messages(text, 4096, 6000)
+    assert len(messages) == 2
+    for embeds in messages:
+        assert len(embeds) == 2
+        assert all(len(embed) <= 4096 for embed in embeds)
+        assert sum(map(len, embeds)) <= 6000
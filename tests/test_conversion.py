@@ -0,0 +1,104 @@
+# tests.test_conversion
+
+import asyncio
+import contextlib
+import os
+import types
+
+from cogs import conversion
+
+
+class Downloads:
+    """
+    Stands in for the bot's download manager, saving placeholder bytes.
+    """
+
+    @contextlib.asynccontextmanager
+    async def download(self, attachment):
+        async def save(path):
+            with open(path, "wb") as file:
+                file.write(b"video")
+
+        yield types.SimpleNamespace(save=save)
+
+
+class Context:
+    """
+    Records what `convert all` sends and the final status it reports.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.guild = None
+        self.message = types.SimpleNamespace(
+            author=types.SimpleNamespace(id=1))
+        self.channel = types.SimpleNamespace(history=self.history)
+        self.uploads = []
+        self.status = None
+
+    async def history(self, limit):
+        for message in self.messages:
+            yield message
+
+    async def send(self, embed=None, files=None):
+        if files is not None:
+            self.uploads.append([file.filename for file in files])
+            return
+
+        async def edit(embed):
+            self.status = embed
+
+        return types.SimpleNamespace(edit=edit)
+
+
+def make_cog(configs=None):
+    cog = conversion.Conversion.__new__(conversion.Conversion)
+    cog.bot = types.SimpleNamespace(downloads=Downloads())
+    cog.configs = configs or {}
+    return cog
+
+
+def attachment(filename):
+    return types.SimpleNamespace(id=hash(filename), filename=filename)
+
+
+def test_gif_conversion_fails_on_unreadable_frame_rate(monkeypatch, tmp_path):
+    async def run_subprocess(args, capture=False):
+        return 0, b"0/0\n"
+
+    monkeypatch.setattr(conversion, "run_subprocess", run_subprocess)
+
+    output, result = asyncio.run(make_cog().convert_to_gif(
+        str(tmp_path), "mp4", "gif", attachment("clip.mp4")))
+
+    assert (output, result) == (None, None)
+    assert os.listdir(tmp_path) == []
+
+
+def test_convert_all_keeps_going_after_an_error(tmp_path):
+    cog = make_cog({
+        "aliases": {},
+        "valid_conversions": {("mov", "mp4"): [[], []]},
+    })
+
+    async def convert_attachment(temp, from_type, to_type, attachment):
+        if attachment.filename == "bad.mov":
+            raise ZeroDivisionError("division by zero")
+
+        output = os.path.join(temp, "good.mp4")
+        with open(output, "wb") as file:
+            file.write(b"video")
+        return output, 0
+
+    cog.convert_attachment = convert_attachment
+    context = Context([
+        types.SimpleNamespace(attachments=[attachment("bad.mov")]),
+        types.SimpleNamespace(attachments=[attachment("good.mov")]),
+    ])
+
+    asyncio.run(conversion.Conversion.convert_all.callback(
+        cog, context, "mp4", 10))
+
+    assert context.uploads == [["good.mp4"]]
+    assert "**1** out of **2**" in context.status.description
+    assert "**1** failed to convert." in context.status.description
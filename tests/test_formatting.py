@@ -0,0 +1,48 @@
+# tests.test_formatting
+
+import asyncio
+import hashlib
+import types
+
+from cogs import formatting
+
+
+class Downloads:
+    """
+    Streams every attachment as the same few bytes.
+    """
+
+    async def stream(self, attachment, chunk_size=None):
+        yield b"file contents"
+
+
+def run_cksum(message, invoked_with="cksum"):
+    cog = formatting.Formatting.__new__(formatting.Formatting)
+    cog.bot = types.SimpleNamespace(downloads=Downloads())
+    rendered = []
+
+    async def render(context, mode, output):
+        rendered.append(output)
+
+    cog.render = render
+    context = types.SimpleNamespace(
+        invoked_with=invoked_with,
+        guild=None,
+        message=types.SimpleNamespace(attachments=[types.SimpleNamespace(
+            filename="image.png", size=13)])
+    )
+
+    asyncio.run(formatting.Formatting.cksum.callback(
+        cog, context, "text", message=message))
+    return rendered[0]
+
+
+def test_cksum_hashes_text_sent_with_an_attachment():
+    assert run_cksum("some text") == hashlib.md5(b"some text").hexdigest()
+
+
+def test_cksum_hashes_attachments_with_listed_algorithms():
+    digest = hashlib.sha1(b"file contents").hexdigest()
+    assert run_cksum("sha1") == f"SHA1 (image.png) = {digest}"
+    assert run_cksum(None, "sha1") == f"SHA1 (image.png) = {digest}"
+    assert run_cksum("all").count("(image.png)") == 8
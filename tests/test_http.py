@@ -0,0 +1,318 @@
+# tests.test_http
+
+# The shared session, the endpoints, and the commands that use them, run
+# against a local aiohttp server standing in for the real APIs.
+
+import asyncio
+import contextlib
+import types
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from cogs import fun
+from utils import metrics
+from utils.custom_exceptions import CircuitOpenError
+from utils.downloads import DownloadManager
+from utils.endpoints import Endpoint
+from utils.facts import FactPool
+from utils.http import create_session
+
+BITCOIN = {"bpi": {"USD": {"code": "USD", "rate": "27,123.4567"}}}
+FACT = {"id": "abc123", "text": "Bananas are berries."}
+
+
+@contextlib.asynccontextmanager
+async def serve(*routes: web.RouteDef):
+    """
+    Run a local server for `routes` and a session from `create_session`.
+    """
+    app = web.Application()
+    app.add_routes(routes)
+
+    async with TestServer(app) as server:
+        session = create_session(read_timeout=1.0)
+        try:
+            yield server, session
+        finally:
+            await session.close()
+
+
+async def slow(request: web.Request) -> web.Response:
+    await asyncio.sleep(5)
+    return web.Response()
+
+
+class Context:
+    """
+    Records what a command sends instead of sending it to Discord.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, *args, **kwargs) -> None:
+        self.sent.append(kwargs.get("embed"))
+
+
+def test_session_reuses_connections():
+    ports = []
+
+    async def handler(request):
+        ports.append(request.transport.get_extra_info("peername")[1])
+        return web.json_response({})
+
+    async def main():
+        async with serve(web.get("/", handler)) as (server, session):
+            for _ in range(5):
+                async with session.get(server.make_url("/")) as response:
+                    await response.read()
+
+    asyncio.run(main())
+    assert len(ports) == 5
+    assert len(set(ports)) == 1
+
+
+def test_session_limits_connections_per_host():
+    active, peak = 0, 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return web.json_response({})
+
+    async def fetch(session, url):
+        async with session.get(url) as response:
+            await response.read()
+
+    async def main():
+        app = web.Application()
+        app.add_routes([web.get("/", handler)])
+        async with TestServer(app) as server:
+            session = create_session(limit_per_host=2)
+            try:
+                await asyncio.gather(*(
+                    fetch(session, server.make_url("/")) for _ in range(6)))
+            finally:
+                await session.close()
+
+    asyncio.run(main())
+    assert peak == 2
+
+
+def test_session_read_timeout():
+    async def main():
+        async with serve(web.get("/", slow)) as (server, session):
+            async with session.get(server.make_url("/")) as response:
+                await response.read()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
+
+
+def test_endpoint_times_out_and_opens_circuit():
+    endpoint = Endpoint("test_timeout", timeout=0.1, failure_threshold=2)
+    timeouts = metrics.counter("endpoints.test_timeout.timeouts")
+    before = timeouts.value
+
+    async def main():
+        async with serve(web.get("/", slow)) as (server, session):
+            async def fetch():
+                async with session.get(server.make_url("/")) as response:
+                    return await response.read()
+
+            for _ in range(2):
+                with pytest.raises(asyncio.TimeoutError):
+                    await endpoint.call(fetch)
+
+            with pytest.raises(CircuitOpenError):
+                await endpoint.call(fetch)
+
+    asyncio.run(main())
+    assert timeouts.value - before == 2
+    assert endpoint.state == "open"
+
+
+def test_download_times_out_after_retries():
+    attempts = 0
+
+    async def handler(request):
+        nonlocal attempts
+        attempts += 1
+        return await slow(request)
+
+    async def main():
+        async with serve(web.get("/file", handler)) as (server, session):
+            downloads = DownloadManager(
+                session, max_retries=1, backoff=0.0, timeout=0.1)
+            attachment = types.SimpleNamespace(
+                id=1, url=str(server.make_url("/file")),
+                filename="file.txt", size=4)
+            await downloads.read(attachment)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
+    assert attempts == 2
+
+
+def test_download_retries_server_errors():
+    attempts = 0
+
+    async def handler(request):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            return web.Response(status=503)
+        return web.Response(body=b"data")
+
+    async def main():
+        async with serve(web.get("/file", handler)) as (server, session):
+            downloads = DownloadManager(session, backoff=0.0)
+            attachment = types.SimpleNamespace(
+                id=1, url=str(server.make_url("/file")),
+                filename="file.txt", size=4)
+            return await downloads.read(attachment)
+
+    assert asyncio.run(main()) == b"data"
+    assert attempts == 2
+
+
+async def run_fun(monkeypatch, routes, test):
+    """
+    Point the fun cog's APIs at a local server and run `test` with the cog.
+    """
+    async with serve(*routes) as (server, session):
+        monkeypatch.setattr(fun, "BITCOIN_URL", str(server.make_url("/btc")))
+        monkeypatch.setattr(fun, "FACT_URL", str(server.make_url("/fact")))
+        cog = fun.Fun(types.SimpleNamespace(session=session))
+        return await test(cog)
+
+
+def test_bitcoin_reports_price(monkeypatch):
+    requests = 0
+
+    async def handler(request):
+        nonlocal requests
+        requests += 1
+        # coindesk serves JSON as text/javascript.
+        return web.json_response(BITCOIN, content_type="text/javascript")
+
+    async def test(cog):
+        contexts = [Context(), Context()]
+        for context in contexts:
+            await fun.Fun.bitcoin.callback(cog, context)
+        return contexts
+
+    contexts = asyncio.run(run_fun(
+        monkeypatch, [web.get("/btc", handler)], test))
+
+    # The second call is answered from the cache.
+    assert requests == 1
+    for context in contexts:
+        assert context.sent[0].description == "$27,123.4567"
+
+
+async def server_error(request: web.Request) -> web.Response:
+    return web.Response(status=500)
+
+
+async def missing_rate(request: web.Request) -> web.Response:
+    return web.json_response({"bpi": {}})
+
+
+async def not_json(request: web.Request) -> web.Response:
+    return web.Response(text="not json")
+
+
+@pytest.mark.parametrize("handler", [server_error, missing_rate, not_json, slow])
+def test_bitcoin_reports_failures(monkeypatch, handler):
+    async def test(cog):
+        cog.coindesk.timeout = 0.1
+        context = Context()
+        await fun.Fun.bitcoin.callback(cog, context)
+        return context
+
+    context = asyncio.run(run_fun(
+        monkeypatch, [web.get("/btc", handler)], test))
+    assert context.sent[0].title == "Error!"
+
+
+def test_dailyfact_sends_fact(monkeypatch):
+    async def handler(request):
+        return web.json_response(FACT)
+
+    async def test(cog):
+        context = Context()
+        await fun.Fun.dailyfact.callback(cog, context)
+        return context
+
+    context = asyncio.run(run_fun(
+        monkeypatch, [web.get("/fact", handler)], test))
+    assert context.sent[0].description == FACT["text"]
+
+
+def test_fetch_fact_times_out(monkeypatch):
+    async def test(cog):
+        cog.uselessfacts.timeout = 0.1
+        await cog.fetch_fact()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run_fun(monkeypatch, [web.get("/fact", slow)], test))
+
+
+@pytest.mark.parametrize("body", [[FACT], {"text": FACT["text"]}])
+def test_fetch_fact_rejects_unexpected_payloads(monkeypatch, body):
+    async def handler(request):
+        return web.json_response(body)
+
+    async def test(cog):
+        await cog.fetch_fact()
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_fun(monkeypatch, [web.get("/fact", handler)], test))
+
+
+def test_fact_pool_backs_off_on_malformed_facts():
+    responses = [{"text": "no id"}, "not a dict", FACT]
+
+    async def fetch():
+        return responses.pop(0)
+
+    async def main():
+        pool = FactPool(fetch, size=1, backoff=0.01)
+        pool.start()
+        await asyncio.sleep(0.1)
+        alive = not pool._task.done()
+        await pool.stop()
+        return alive, list(pool._pool)
+
+    alive, facts = asyncio.run(main())
+    assert alive
+    assert facts == [FACT]
+
+
+def test_fact_pool_restarts_dead_refill_task():
+    async def fetch():
+        return FACT
+
+    async def main():
+        pool = FactPool(fetch, size=1)
+
+        async def die():
+            raise RuntimeError("boom")
+
+        pool._task = asyncio.ensure_future(die())
+        await asyncio.sleep(0)
+        fact = await pool.get()
+        await asyncio.sleep(0.01)
+        alive = not pool._task.done()
+        await pool.stop()
+        return fact, alive
+
+    fact, alive = asyncio.run(main())
+    assert fact == FACT
+    assert alive
@@ -0,0 +1,166 @@
+# tests.test_outbound
+
+import asyncio
+import time
+import types
+
+import aiohttp
+import discord
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.outbound import BULK, INTERACTIVE, SendScheduler
+
+
+class Channel:
+    """
+    Stands in for a channel, sending each message as a request to a local
+    server that answers with Discord's rate limit headers.
+    """
+
+    def __init__(self, session=None, url=None, errors=()):
+        self.id = 1
+        self.session = session
+        self.url = url
+        self.errors = list(errors)
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        if self.session is not None:
+            async with self.session.get(self.url) as response:
+                await response.read()
+
+        self.sent.append((content, time.monotonic()))
+        return content
+
+
+def rate_limited_app(limit: int, reset_after: float) -> web.Application:
+    requests = 0
+
+    async def handler(request):
+        nonlocal requests
+        requests += 1
+        return web.Response(headers={
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(max(0, limit - requests)),
+            "X-RateLimit-Reset-After": str(reset_after),
+        })
+
+    app = web.Application()
+    app.add_routes([web.get("/", handler)])
+    return app
+
+
+def test_exhausted_bucket_is_waited_out():
+    async def main():
+        outbound = SendScheduler()
+        async with TestServer(rate_limited_app(2, 0.3)) as server:
+            # discord.py is given the same trace config as `http_trace`.
+            session = aiohttp.ClientSession(
+                trace_configs=[outbound.trace_config])
+            channel = Channel(session, server.make_url("/"))
+            try:
+                await asyncio.gather(*(
+                    outbound.send(channel, str(i)) for i in range(3)))
+            finally:
+                await session.close()
+        return channel
+
+    channel = asyncio.run(main())
+    assert [content for content, _ in channel.sent] == ["0", "1", "2"]
+    # The second response said the bucket was empty for 0.3 seconds.
+    assert channel.sent[2][1] - channel.sent[1][1] >= 0.25
+
+
+def test_replies_go_ahead_of_queued_bulk_sends():
+    async def main():
+        outbound = SendScheduler()
+        channel = Channel()
+        # As if the last response had emptied this channel's bucket.
+        outbound._buckets["channel:1"] = (0, time.monotonic() + 0.1)
+
+        bulk = [asyncio.ensure_future(
+            outbound.send(channel, f"bulk {i}", priority=BULK))
+            for i in range(3)]
+        await asyncio.sleep(0.01)
+        reply = outbound.send(channel, "reply", priority=INTERACTIVE)
+        await asyncio.gather(reply, *bulk)
+        return channel
+
+    channel = asyncio.run(main())
+    assert [content for content, _ in channel.sent] == [
+        "reply", "bulk 0", "bulk 1", "bulk 2"]
+
+
+def test_rate_limits_are_retried():
+    async def main():
+        outbound = SendScheduler(max_retries=3)
+        channel = Channel(errors=[discord.RateLimited(0.05)] * 3)
+        return await outbound.send(channel, "hello"), channel
+
+    result, channel = asyncio.run(main())
+    assert result == "hello"
+    assert len(channel.sent) == 1
+
+
+def test_rate_limit_retries_run_out():
+    async def main():
+        outbound = SendScheduler(max_retries=2)
+        channel = Channel(errors=[discord.RateLimited(0.01)] * 3)
+        await outbound.send(channel, "hello")
+
+    with pytest.raises(discord.RateLimited):
+        asyncio.run(main())
+
+
+def test_contexts_are_sent_directly_by_the_worker():
+    async def main():
+        outbound = SendScheduler()
+        channel = Channel()
+
+        async def send_now(content=None, **kwargs):
+            return await channel.send(content, **kwargs)
+
+        async def send(content=None, **kwargs):
+            # A context's own send would queue again and never finish.
+            raise AssertionError("queued twice")
+
+        context = types.SimpleNamespace(
+            channel=channel, send=send, send_now=send_now)
+        await outbound.send(context, "hello", priority=INTERACTIVE)
+        return channel
+
+    channel = asyncio.run(main())
+    assert [content for content, _ in channel.sent] == ["hello"]
+
+
+def test_edits_and_reactions_are_queued_per_channel():
+    async def main():
+        outbound = SendScheduler()
+        channel = Channel()
+        calls = []
+
+        async def edit(**kwargs):
+            calls.append(("edit", kwargs["embed"]))
+
+        async def clear_reactions():
+            calls.append(("clear", None))
+
+        message = types.SimpleNamespace(
+            channel=channel, edit=edit, clear_reactions=clear_reactions)
+        # The channel's messages are rate limited, but not its reactions.
+        outbound._buckets["channel:1"] = (0, time.monotonic() + 0.1)
+
+        edit = asyncio.ensure_future(
+            outbound.edit(message, embed="results", priority=BULK))
+        await outbound.clear_reactions(message)
+        cleared = list(calls)
+        await edit
+        return cleared, calls
+
+    cleared, calls = asyncio.run(main())
+    assert cleared == [("clear", None)]
+    assert calls == [("clear", None), ("edit", "results")]
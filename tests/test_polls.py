@@ -0,0 +1,76 @@
+# tests.test_polls
+
+import asyncio
+import datetime
+import types
+
+import discord
+
+from cogs import fun
+from utils.interactions import ReactionRegistry
+from utils.polls import Poll, PollTracker
+
+
+def message_id(days_ago: float) -> int:
+    return discord.utils.time_snowflake(
+        discord.utils.utcnow() - datetime.timedelta(days=days_ago))
+
+
+def make_bot():
+    return types.SimpleNamespace(interactions=ReactionRegistry(), user=None)
+
+
+def make_poll(message_id: int) -> Poll:
+    return Poll(message_id, 1, "Lunch?", 2, "author")
+
+
+def test_old_open_polls_are_dropped(tmp_path):
+    path = str(tmp_path / "polls.json")
+    old, new = message_id(40), message_id(1)
+
+    tracker = PollTracker(make_bot(), None, path=path, max_age=30 * 86400)
+    tracker.track(make_poll(old))
+    tracker.track(make_poll(new))
+    asyncio.run(tracker.expire())
+
+    assert list(tracker.polls) == [new]
+    assert old not in tracker.bot.interactions._handlers
+    tracker.save()
+
+    reloaded = PollTracker(make_bot(), None, path=path)
+    reloaded.load()
+    assert list(reloaded.polls) == [new]
+
+
+def test_expired_polls_are_skipped_on_load(tmp_path):
+    path = str(tmp_path / "polls.json")
+    old, new = message_id(40), message_id(1)
+
+    tracker = PollTracker(make_bot(), None, path=path, max_age=100 * 86400)
+    tracker.track(make_poll(old))
+    tracker.track(make_poll(new))
+    tracker.save()
+
+    reloaded = PollTracker(make_bot(), None, path=path, max_age=30 * 86400)
+    reloaded.load()
+    assert list(reloaded.polls) == [new]
+    # The file still holds the old poll until the next snapshot.
+    assert reloaded._dirty
+
+
+def test_deleted_polls_are_dropped(tmp_path):
+    cog = fun.Fun.__new__(fun.Fun)
+    cog.polls = PollTracker(
+        make_bot(), None, path=str(tmp_path / "polls.json"))
+    first, second, third = message_id(3), message_id(2), message_id(1)
+    for poll_id in (first, second, third):
+        cog.polls.track(make_poll(poll_id))
+
+    async def main():
+        await fun.Fun.on_raw_message_delete(
+            cog, types.SimpleNamespace(message_id=first))
+        await fun.Fun.on_raw_bulk_message_delete(
+            cog, types.SimpleNamespace(message_ids={second, 12345}))
+
+    asyncio.run(main())
+    assert list(cog.polls.polls) == [third]